@@ -36,7 +36,9 @@ def setup_technical_improvements():
     print("4. Checking spaCy model...")
     try:
         import spacy
-        spacy.load("en_core_web_sm")
+        # Check the package is installed without loading the whole pipeline
+        if not spacy.util.is_package("en_core_web_sm"):
+            raise OSError("en_core_web_sm not installed")
         print("   ✓ spaCy model already installed")
     except:
         print("   Installing spaCy model...")
@@ -6,11 +6,11 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.api_server import app
+from src.config import ensure_all_dirs
 
 if __name__ == '__main__':
     # Create necessary directories
-    os.makedirs('logs', exist_ok=True)
-    os.makedirs('models', exist_ok=True)
+    ensure_all_dirs()
     
     print("Starting Document Parser API Server...")
     print("API will be available at: http://localhost:5000")
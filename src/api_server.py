@@ -19,9 +19,10 @@ sys.path.insert(0, project_root)
 # Now import the modules
 try:
     from src.search_engine import DocumentSearchEngine
-    from src.export_manager import ExportManager
+    from src.export_manager import ExportManager, MIN_SEGMENT_SIZE, MAX_SEGMENT_SIZE
     from src.document_preview import DocumentPreviewGenerator
     from src.rate_limiter import RateLimitManager
+    from src.config import ensure
     from src.celery_app import celery_app, process_document_async, batch_process_documents_async, export_documents_async, get_task_status
     print("✓ All technical improvement modules imported successfully")
 except ImportError as e:
@@ -31,9 +32,13 @@ except ImportError as e:
         def __init__(self, db): pass
         def search_documents(self, *args, **kwargs): return {"success": False, "error": "Search engine not available"}
         def get_search_facets(self, *args, **kwargs): return {}
+        def invalidate(self, *args, **kwargs): pass
+        def document_added(self, *args, **kwargs): pass
+        def document_removed(self, *args, **kwargs): pass
     
     class ExportManager:
         def __init__(self, db): pass
+    MIN_SEGMENT_SIZE, MAX_SEGMENT_SIZE = 10, 1000
     
     class DocumentPreviewGenerator:
         def __init__(self, *args, **kwargs): pass
@@ -43,6 +48,10 @@ except ImportError as e:
     class RateLimitManager:
         def __init__(self, app): pass
     
+    def ensure(path):
+        os.makedirs(path, exist_ok=True)
+        return path
+    
     # Dummy Celery functions
     def process_document_async(*args, **kwargs): return None
     def batch_process_documents_async(*args, **kwargs): return None
@@ -57,6 +66,7 @@ from flask_jwt_extended import JWTManager, jwt_required, create_access_token, ge
 from flask_cors import CORS
 from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError
+from src.config import get_config
 
 # Load environment variables
 load_dotenv()
@@ -99,7 +109,10 @@ try:
     mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
     database_name = os.getenv('DATABASE_NAME', 'document_parser_db')
     
-    client = MongoClient(mongodb_uri)
+    # The one client for the whole server; every collection and the search
+    # engine share its pool, and large result pages are compressed on the wire
+    client = MongoClient(mongodb_uri, compressors=get_config().mongodb_compressors,
+                         zlibCompressionLevel=6)
     db = client[database_name]
     users_collection = db['users']
     documents_collection = db['parsed_documents']
@@ -1576,20 +1589,34 @@ def export_documents():
         if not document_ids:
             return format_api_response(False, None, "No documents selected for export", 400)
         
+        # Optionally split large exports into parts delivered as one ZIP
+        segment_size = data.get('segment_size')
+        # bool is an int subclass, so true would otherwise mean one document per part
+        if segment_size is not None and (isinstance(segment_size, bool) or not isinstance(segment_size, int)
+                                         or not MIN_SEGMENT_SIZE <= segment_size <= MAX_SEGMENT_SIZE):
+            return format_api_response(
+                False, None, f"segment_size must be an integer from {MIN_SEGMENT_SIZE} to {MAX_SEGMENT_SIZE}", 400)
+        
+        # JSON exports carry full_text unless the client opts out
+        include_full_text = data.get('include_full_text', True)
+        if not isinstance(include_full_text, bool):
+            return format_api_response(False, None, "include_full_text must be a boolean", 400)
+        
         # For now, use synchronous export (simpler)
         try:
+            # Every format is written straight to the export file below
             if export_format == 'csv':
-                export_result = export_manager.export_to_csv(document_ids, user_id)
                 file_extension = '.csv'
                 mime_type = 'text/csv'
             elif export_format == 'excel':
-                export_result = export_manager.export_to_excel(document_ids, user_id)
                 file_extension = '.xlsx'
                 mime_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             elif export_format == 'json':
-                export_result = export_manager.export_to_json(document_ids, user_id)
                 file_extension = '.json'
                 mime_type = 'application/json'
+            if segment_size:
+                file_extension = '.zip'
+                mime_type = 'application/zip'
             
             # Generate filename
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -1597,18 +1624,39 @@ def export_documents():
             export_path = f"data/exports/{export_filename}"
             
             # Ensure directory exists
-            os.makedirs("data/exports", exist_ok=True)
+            ensure("data/exports")
             
             # Save the export file
-            if hasattr(export_result, 'getvalue'):
-                # It's a BytesIO or StringIO object
-                mode = 'wb' if export_format != 'csv' else 'w'
-                with open(export_path, mode) as f:
-                    f.write(export_result.getvalue())
+            if segment_size:
+                try:
+                    export_manager.export_to_zip_segments(
+                        document_ids, user_id, export_format, export_path, segment_size,
+                        include_full_text=include_full_text
+                    )
+                except Exception:
+                    if os.path.exists(export_path):
+                        os.unlink(export_path)
+                    raise
+            elif export_format == 'excel':
+                # A failed workbook would leave a truncated .xlsx behind
+                try:
+                    export_manager.export_to_excel(document_ids, user_id, output=export_path)
+                except Exception:
+                    if os.path.exists(export_path):
+                        os.unlink(export_path)
+                    raise
             else:
-                # It's a string (JSON)
-                with open(export_path, 'w', encoding='utf-8') as f:
-                    f.write(export_result)
+                try:
+                    with open(export_path, 'w', newline='', encoding='utf-8') as f:
+                        if export_format == 'csv':
+                            export_manager.export_to_csv_stream(document_ids, user_id, f)
+                        else:
+                            export_manager.export_to_json_stream(document_ids, user_id, f,
+                                                                 include_full_text=include_full_text)
+                except Exception:
+                    if os.path.exists(export_path):
+                        os.unlink(export_path)
+                    raise
             
             logger.info(f"Export created: {export_filename} with {len(document_ids)} documents")
             
@@ -1675,6 +1723,8 @@ def download_export(filename):
             mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         elif filename.endswith('.json'):
             mimetype = 'application/json'
+        elif filename.endswith('.zip'):
+            mimetype = 'application/zip'
         else:
             mimetype = 'application/octet-stream'
         
@@ -1880,15 +1930,18 @@ def delete_document(document_id):
         if documents_collection is None:
             return format_api_response(False, None, "Document storage not available", 503)
         
-        # Find and delete document
-        result = documents_collection.delete_one({
-            "document_id": document_id,
-            "user_id": user_id
-        })
+        # Find and delete document, keeping the fields its facets were counted under
+        deleted = documents_collection.find_one_and_delete(
+            {"document_id": document_id, "user_id": user_id},
+            projection={"document_type": 1, "file_type": 1, "created_at": 1}
+        )
         
-        if result.deleted_count == 0:
+        if deleted is None:
             return format_api_response(False, None, "Document not found", 404)
         
+        # Facets and cached searches no longer match the user's documents
+        search_engine.document_removed(user_id, deleted)
+        
         # Clean up preview files
         preview_generator.cleanup_previews(document_id)
         
@@ -1960,7 +2013,9 @@ def original_parse_document():
         preview_data = {}
         if result["success"]:
             if tmp_path.lower().endswith('.pdf'):
-                preview_path, thumbnail_path = preview_generator.generate_pdf_preview(tmp_path, document_id)
+                preview_path, thumbnail_path = preview_generator.generate_pdf_preview(
+                    tmp_path, document_id, lightweight=get_config().lightweight_pdf_previews
+                )
             else:
                 preview_path, thumbnail_path = preview_generator.generate_image_preview(tmp_path, document_id)
             
@@ -2066,7 +2121,9 @@ def batch_parse():
                 preview_data = {}
                 if result["success"]:
                     if tmp_path.lower().endswith('.pdf'):
-                        preview_path, thumbnail_path = preview_generator.generate_pdf_preview(tmp_path, document_id)
+                        preview_path, thumbnail_path = preview_generator.generate_pdf_preview(
+                            tmp_path, document_id, lightweight=get_config().lightweight_pdf_previews
+                        )
                     else:
                         preview_path, thumbnail_path = preview_generator.generate_image_preview(tmp_path, document_id)
                     
@@ -2184,6 +2241,7 @@ def save_document_to_db(user_id, filename, file_type, file_size, result, documen
         # Insert into database
         result = documents_collection.insert_one(document_data)
         document_db_id = str(result.inserted_id)
+        search_engine.document_added(user_id, document_data)
         
         logger.info(f"Document saved to database for user {user_id}: {filename} (DB ID: {document_db_id})")
         return document_id
@@ -2293,5 +2351,5 @@ if __name__ == '__main__':
     logger.info("Web Interface: http://localhost:5000")
     logger.info("API Health: http://localhost:5000/api/health")
     
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Run the Flask app; FLASK_DEBUG=1 enables the reloader and debugger
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG') == '1', threaded=True)
\ No newline at end of file
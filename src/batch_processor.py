@@ -3,6 +3,7 @@ import os
 import json
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Add the parent directory to Python path
 import sys
@@ -10,60 +11,104 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.document_parser import DocumentParser
 
-def process_directory(input_dir, output_dir, model_path=None):
-    """Process all PDFs in a directory"""
-    parser = DocumentParser(model_path)
+# Prefer orjson for writing result files, fall back to the stdlib encoder
+try:
+    import orjson
     
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode('utf-8')
+
+# Per-worker parser, created once by _init_worker
+_parser = None
+
+def _init_worker(model_path):
+    """Pool initializer: load the parser and model once per worker process"""
+    global _parser
+    # Files are already spread across processes; don't split pages again
+    _parser = DocumentParser(model_path, pdf_workers=1)
+
+def _process_one(pdf_path, output_dir, parser=None):
+    """Parse a single PDF and write its results JSON"""
+    pdf_file = Path(pdf_path)
+    parser = parser or _parser
+    try:
+        print(f"Processing {pdf_file.name}...")
+        
+        # Parse the document
+        result = parser.parse_document(str(pdf_file))
+        
+        if result["success"]:
+            # Save results to JSON
+            output_file = Path(output_dir) / f"{pdf_file.stem}_results.json"
+            with open(output_file, 'wb') as f:
+                f.write(_dumps(result))
+            
+            return {
+                'file': pdf_file.name,
+                'success': True,
+                'output_file': str(output_file)
+            }
+        else:
+            print(f"Failed to process {pdf_file.name}: {result.get('error')}")
+            return {
+                'file': pdf_file.name,
+                'success': False,
+                'error': result.get('error')
+            }
+            
+    except Exception as e:
+        print(f"Error processing {pdf_file.name}: {str(e)}")
+        return {
+            'file': pdf_file.name,
+            'success': False,
+            'error': str(e)
+        }
+
+def process_directory(input_dir, output_dir, model_path=None, max_workers=None, parser=None):
+    """Process all PDFs in a directory
+    
+    By default files are parsed in parallel worker processes, each loading the
+    model from model_path. Callers that invoke this repeatedly can pass an
+    already-constructed parser instead, which processes the files in-process
+    and skips reloading the model on every call.
+    """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True, parents=True)
     
+    # Largest files first so long jobs overlap with the many short ones
+    with os.scandir(input_path) as entries:
+        pdf_entries = [e for e in entries
+                       if e.is_file() and e.name.lower().endswith('.pdf')]
+    pdf_entries.sort(key=lambda e: e.stat().st_size, reverse=True)
+    pdf_files = [Path(e.path) for e in pdf_entries]
     results = []
     
-    for pdf_file in input_path.glob("*.pdf"):
-        try:
-            print(f"Processing {pdf_file.name}...")
-            
-            # Parse the document
-            result = parser.parse_document(str(pdf_file))
-            
-            if result["success"]:
-                # Save results to JSON
-                output_file = output_path / f"{pdf_file.stem}_results.json"
-                with open(output_file, 'w') as f:
-                    json.dump(result, f, indent=2)
-                
-                results.append({
-                    'file': pdf_file.name,
-                    'success': True,
-                    'output_file': str(output_file)
-                })
-            else:
-                print(f"Failed to process {pdf_file.name}: {result.get('error')}")
-                results.append({
-                    'file': pdf_file.name,
-                    'success': False,
-                    'error': result.get('error')
-                })
-                
-        except Exception as e:
-            print(f"Error processing {pdf_file.name}: {str(e)}")
-            results.append({
-                'file': pdf_file.name,
-                'success': False,
-                'error': str(e)
-            })
+    if parser is not None:
+        results = [_process_one(str(pdf_file), str(output_path), parser)
+                   for pdf_file in pdf_files]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                 initializer=_init_worker,
+                                 initargs=(model_path,)) as executor:
+            futures = [executor.submit(_process_one, str(pdf_file), str(output_path))
+                       for pdf_file in pdf_files]
+            for future in as_completed(futures):
+                results.append(future.result())
     
     # Save summary report
     summary_file = output_path / "processing_summary.json"
-    with open(summary_file, 'w') as f:
-        json.dump({
+    with open(summary_file, 'wb') as f:
+        f.write(_dumps({
             "processed_date": datetime.now().isoformat(),
             "total_files": len(results),
             "successful": len([r for r in results if r['success']]),
             "failed": len([r for r in results if not r['success']]),
             "details": results
-        }, f, indent=2)
+        }))
     
     print(f"Processing complete. Summary saved to {summary_file}")
     return results
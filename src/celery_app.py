@@ -1,7 +1,11 @@
 import os
 from celery import Celery
-from celery.signals import after_setup_logger
+from celery.signals import after_setup_logger, worker_process_init
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import threading
+import atexit
 from datetime import datetime
 from typing import Dict, Any, List
 import tempfile
@@ -29,6 +33,7 @@ celery_app.conf.update(
     task_routes={
         'src.celery_app.process_document_async': {'queue': 'parsing'},
         'src.celery_app.batch_process_documents_async': {'queue': 'batch'},
+        'src.celery_app.finalize_batch': {'queue': 'batch'},
         'src.celery_app.generate_previews_async': {'queue': 'previews'},
         'src.celery_app.export_documents_async': {'queue': 'exports'},
     },
@@ -40,24 +45,138 @@ celery_app.conf.update(
     }
 )
 
+# Log records are queued by task code and written to disk by a background thread
+_log_queue = queue.Queue(-1)
+_log_file_handler = None
+_log_listener = None
+_log_queue_handlers = []
+
+def _start_log_listener():
+    """Start the file-writing listener thread for the current process"""
+    global _log_listener
+    if _log_file_handler is None:
+        return
+    _log_listener = QueueListener(_log_queue, _log_file_handler)
+    _log_listener.start()
+    # atexit hooks are inherited across fork, so only stop the listener in the
+    # process that started it
+    owner_pid = os.getpid()
+    listener = _log_listener
+    atexit.register(lambda: os.getpid() == owner_pid and listener.stop())
+
 @after_setup_logger.connect
 def setup_celery_logging(logger, *args, **kwargs):
     """Configure logging for Celery"""
+    global _log_file_handler
+    from src.config import ensure_all_dirs
+    ensure_all_dirs()
+    
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler = logging.FileHandler('logs/celery.log')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    if _log_file_handler is None:
+        _log_file_handler = logging.FileHandler('logs/celery.log')
+        _log_file_handler.setFormatter(formatter)
+        _start_log_listener()
+    queue_handler = QueueHandler(_log_queue)
+    _log_queue_handlers.append(queue_handler)
+    logger.addHandler(queue_handler)
+
+@worker_process_init.connect
+def _restart_log_listener(**kwargs):
+    """Give a freshly forked worker its own log queue, file handler and listener
+
+    Threads do not survive fork, and the inherited queue and handler locks may
+    have been copied mid-acquire, so none of the parent's objects are reused.
+    """
+    global _log_queue, _log_file_handler
+    if _log_file_handler is None:
+        return
+    formatter = _log_file_handler.formatter
+    _log_queue = queue.Queue(-1)
+    _log_file_handler = logging.FileHandler('logs/celery.log')
+    _log_file_handler.setFormatter(formatter)
+    for queue_handler in _log_queue_handlers:
+        queue_handler.queue = _log_queue
+    _start_log_listener()
+
+# Process-wide MongoDB client; PyMongo pools connections internally
+_mongo = None
+
+def _get_db():
+    """Return the document database, creating the shared client on first use"""
+    global _mongo
+    if _mongo is None:
+        from pymongo import MongoClient
+        from src.config import get_config
+        _mongo = MongoClient('mongodb://localhost:27017/', maxPoolSize=50,
+                             compressors=get_config().mongodb_compressors, zlibCompressionLevel=6)
+    return _mongo['document_parser_db']
+
+@worker_process_init.connect
+def _reset_mongo_client(**kwargs):
+    """Drop any client inherited from the parent; PyMongo clients are not fork-safe"""
+    global _mongo
+    _mongo = None
+
+# Per-worker parser and preview generator, loaded once instead of per task
+_parser = None
+_parser_lock = threading.Lock()
+_preview_generator = None
+
+# Queues whose tasks parse documents and so benefit from a preloaded model
+_WARMUP_QUEUES = {'parsing', 'batch'}
+
+def _get_parser():
+    """Return the worker's DocumentParser, loading it on first use"""
+    global _parser
+    if _parser is None:
+        # The warmup thread and the first task may ask at the same time
+        with _parser_lock:
+            if _parser is None:
+                # Import here to avoid circular imports
+                from src.document_parser import DocumentParser
+                _parser = DocumentParser()
+    return _parser
+
+def _get_preview_generator():
+    """Return the worker's DocumentPreviewGenerator, creating it on first use"""
+    global _preview_generator
+    if _preview_generator is None:
+        from src.document_preview import DocumentPreviewGenerator
+        _preview_generator = DocumentPreviewGenerator()
+    return _preview_generator
+
+@worker_process_init.connect
+def _warmup_worker(**kwargs):
+    """Start loading the parser in the background if this worker consumes parsing queues
+
+    Loading spaCy and the model takes longer than worker_proc_alive_timeout,
+    so it must not block process init; export/preview-only workers and the
+    preview generator load lazily on their first task instead.
+    """
+    consumed = set(getattr(celery_app.amqp.queues, 'consume_from', None) or ())
+    if consumed and not consumed & _WARMUP_QUEUES:
+        return
+    threading.Thread(target=_get_parser, name='parser-warmup', daemon=True).start()
 
 class TaskProgress:
-    """Helper class for tracking task progress"""
-    def __init__(self, task, total_steps: int = 100):
+    """Helper class for tracking task progress
+    
+    update_state serializes the meta and round-trips to the result backend, so
+    loops can pass update_every > 1 to only report every Nth step (the first
+    and last steps are always reported).
+    """
+    def __init__(self, task, total_steps: int = 100, update_every: int = 1):
         self.task = task
         self.total_steps = total_steps
+        self.update_every = max(1, update_every)
         self.current_step = 0
     
-    def update_progress(self, step: int, message: str = None):
+    def update_progress(self, step: int, message: str = None, ts: str = None):
         """Update task progress"""
         self.current_step = step
+        if step % self.update_every and step not in (1, self.total_steps):
+            return
+        
         progress = (step / self.total_steps) * 100
         
         self.task.update_state(
@@ -67,7 +186,7 @@ class TaskProgress:
                 'total': self.total_steps,
                 'progress': progress,
                 'message': message,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': ts or datetime.now().isoformat()
             }
         )
 
@@ -78,14 +197,10 @@ def process_document_async(self, file_path: str, user_id: str, document_id: str,
     try:
         progress = TaskProgress(self, total_steps=4)
         
-        # Import here to avoid circular imports
-        from src.document_parser import DocumentParser
-        from src.document_preview import DocumentPreviewGenerator
-        
         progress.update_progress(1, "Initializing document parser...")
         
-        # Initialize parser
-        parser = DocumentParser()
+        # Reuse the parser loaded at worker start
+        parser = _get_parser()
         
         progress.update_progress(2, "Parsing document content...")
         
@@ -97,13 +212,19 @@ def process_document_async(self, file_path: str, user_id: str, document_id: str,
         # Generate preview if requested
         preview_data = {}
         if generate_preview and result["success"]:
-            preview_generator = DocumentPreviewGenerator()
+            preview_generator = _get_preview_generator()
+            
+            # Retries and reprocessing reuse previews newer than the source file
+            preview_path, thumbnail_path = preview_generator.find_existing_preview(
+                file_path, document_id
+            )
             
-            if file_path.lower().endswith('.pdf'):
+            if not preview_path and file_path.lower().endswith('.pdf'):
+                from src.config import get_config
                 preview_path, thumbnail_path = preview_generator.generate_pdf_preview(
-                    file_path, document_id
+                    file_path, document_id, lightweight=get_config().lightweight_pdf_previews
                 )
-            else:
+            elif not preview_path:
                 preview_path, thumbnail_path = preview_generator.generate_image_preview(
                     file_path, document_id
                 )
@@ -150,82 +271,31 @@ def process_document_async(self, file_path: str, user_id: str, document_id: str,
 @celery_app.task(bind=True, name='batch_process_documents_async')
 def batch_process_documents_async(self, file_paths: List[str], user_id: str, 
                                 use_ml: bool = True) -> Dict[str, Any]:
-    """Background task to process multiple documents in batch"""
+    """Background task to process multiple documents in batch
+    
+    Each file is parsed by its own process_document_async subtask so the batch
+    spreads across the parsing queue; finalize_batch aggregates the results.
+    """
     try:
-        total_files = len(file_paths)
-        progress = TaskProgress(self, total_steps=total_files + 2)
-        
-        from src.document_parser import DocumentParser
-        from src.document_preview import DocumentPreviewGenerator
-        
-        progress.update_progress(0, "Initializing batch processing...")
+        from celery import chord, group
         
-        parser = DocumentParser()
-        preview_generator = DocumentPreviewGenerator()
-        
-        results = []
-        successful = 0
-        failed = 0
-        
-        for i, file_path in enumerate(file_paths):
-            document_id = f"batch_{self.request.id}_{i}"
-            
-            progress.update_progress(
-                i + 1, 
-                f"Processing {i+1}/{total_files}: {Path(file_path).name}"
-            )
-            
-            try:
-                # Parse document
-                result = parser.parse_document(file_path, use_ml=use_ml)
-                
-                # Generate preview
-                if file_path.lower().endswith('.pdf'):
-                    preview_path, thumbnail_path = preview_generator.generate_pdf_preview(
-                        file_path, document_id
-                    )
-                else:
-                    preview_path, thumbnail_path = preview_generator.generate_image_preview(
-                        file_path, document_id
-                    )
-                
-                results.append({
-                    "filename": Path(file_path).name,
-                    "document_id": document_id,
-                    "success": True,
-                    "result": result,
-                    "preview_generated": bool(preview_path)
-                })
-                successful += 1
-                
-            except Exception as e:
-                logging.error(f"Error processing {file_path}: {e}")
-                results.append({
-                    "filename": Path(file_path).name,
-                    "document_id": document_id,
-                    "success": False,
-                    "error": str(e)
-                })
-                failed += 1
-            
-            finally:
-                # Clean up temporary file
-                if os.path.exists(file_path) and tempfile.gettempdir() in file_path:
-                    try:
-                        os.unlink(file_path)
-                    except:
-                        pass
+        total_files = len(file_paths)
+        document_ids = [f"batch_{self.request.id}_{i}" for i in range(total_files)]
         
-        progress.update_progress(total_files + 1, "Batch processing completed")
+        job = group(
+            process_document_async.s(file_path, user_id, document_id, use_ml)
+            for file_path, document_id in zip(file_paths, document_ids)
+        )
+        filenames = [Path(file_path).name for file_path in file_paths]
+        finalize = chord(job)(finalize_batch.s(filenames, self.request.id))
         
         return {
             "success": True,
             "total_processed": total_files,
-            "successful": successful,
-            "failed": failed,
-            "results": results,
+            "document_ids": document_ids,
+            "finalize_task_id": finalize.id,
             "task_id": self.request.id,
-            "completed_at": datetime.now().isoformat()
+            "dispatched_at": datetime.now().isoformat()
         }
         
     except Exception as e:
@@ -237,19 +307,49 @@ def batch_process_documents_async(self, file_paths: List[str], user_id: str,
             "completed_at": datetime.now().isoformat()
         }
 
+@celery_app.task(bind=True, name='finalize_batch')
+def finalize_batch(self, task_results: List[Dict[str, Any]], filenames: List[str],
+                   batch_task_id: str) -> Dict[str, Any]:
+    """Chord callback aggregating per-document results of a batch"""
+    results = []
+    for filename, task_result in zip(filenames, task_results):
+        if task_result.get("success"):
+            results.append({
+                "filename": filename,
+                "document_id": task_result.get("document_id"),
+                "success": True,
+                "result": task_result.get("processing_result"),
+                "preview_generated": task_result.get("preview_data", {}).get("preview_generated", False)
+            })
+        else:
+            results.append({
+                "filename": filename,
+                "document_id": task_result.get("document_id"),
+                "success": False,
+                "error": task_result.get("error")
+            })
+    
+    successful = len([r for r in results if r["success"]])
+    
+    return {
+        "success": True,
+        "total_processed": len(results),
+        "successful": successful,
+        "failed": len(results) - successful,
+        "results": results,
+        "task_id": batch_task_id,
+        "completed_at": datetime.now().isoformat()
+    }
+
 @celery_app.task(bind=True, name='generate_previews_async')
 def generate_previews_async(self, document_ids: List[str]) -> Dict[str, Any]:
     """Background task to generate previews for existing documents"""
     try:
-        progress = TaskProgress(self, total_steps=len(document_ids))
+        progress = TaskProgress(self, total_steps=len(document_ids), update_every=5)
         
-        from src.document_preview import DocumentPreviewGenerator
-        from pymongo import MongoClient
-        
-        client = MongoClient('mongodb://localhost:27017/')
-        db = client['document_parser_db']
+        db = _get_db()
         
-        preview_generator = DocumentPreviewGenerator()
+        preview_generator = _get_preview_generator()
         results = []
         
         for i, doc_id in enumerate(document_ids):
@@ -274,8 +374,6 @@ def generate_previews_async(self, document_ids: List[str]) -> Dict[str, Any]:
                 "message": "Preview generation queued"
             })
         
-        client.close()
-        
         return {
             "success": True,
             "results": results,
@@ -293,60 +391,59 @@ def generate_previews_async(self, document_ids: List[str]) -> Dict[str, Any]:
 
 @celery_app.task(bind=True, name='export_documents_async')
 def export_documents_async(self, document_ids: List[str], user_id: str, 
-                          export_format: str = 'csv') -> Dict[str, Any]:
+                          export_format: str = 'csv', include_full_text: bool = True) -> Dict[str, Any]:
     """Background task to export documents in various formats"""
     try:
         progress = TaskProgress(self, total_steps=3)
         
         from src.export_manager import ExportManager
-        from pymongo import MongoClient
         
         progress.update_progress(1, "Preparing export data...")
         
-        client = MongoClient('mongodb://localhost:27017/')
-        db = client['document_parser_db']
-        export_manager = ExportManager(db)
+        export_manager = ExportManager(_get_db())
         
         progress.update_progress(2, f"Generating {export_format.upper()} export...")
         
-        # Generate export based on format
-        if export_format == 'csv':
-            export_data = export_manager.export_to_csv(document_ids, user_id)
-            file_extension = '.csv'
-            mime_type = 'text/csv'
-        elif export_format == 'excel':
-            export_data = export_manager.export_to_excel(document_ids, user_id)
-            file_extension = '.xlsx'
-            mime_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        elif export_format == 'json':
-            export_data = export_manager.export_to_json(document_ids, user_id)
-            file_extension = '.json'
-            mime_type = 'application/json'
-        else:
+        file_extensions = {'csv': '.csv', 'excel': '.xlsx', 'json': '.json'}
+        if export_format not in file_extensions:
             raise ValueError(f"Unsupported export format: {export_format}")
         
-        progress.update_progress(3, "Export completed successfully")
-        
-        # Save export result to file (in real implementation)
-        export_filename = f"export_{self.request.id}{file_extension}"
+        export_filename = f"export_{self.request.id}{file_extensions[export_format]}"
         export_path = f"data/exports/{export_filename}"
         
-        # Ensure directory exists
-        os.makedirs("data/exports", exist_ok=True)
+        # Ensure directory exists (only the first export in this worker touches the filesystem)
+        from src.config import ensure
+        ensure("data/exports")
         
-        if hasattr(export_data, 'getvalue'):
-            # It's a BytesIO or StringIO object
-            with open(export_path, 'wb' if export_format != 'csv' else 'w') as f:
-                if export_format == 'csv':
-                    f.write(export_data.getvalue())
-                else:
-                    f.write(export_data.getvalue())
+        # Generate export based on format
+        if export_format == 'csv':
+            # Rows are written straight to disk instead of buffered in memory
+            try:
+                with open(export_path, 'w', newline='', encoding='utf-8') as f:
+                    export_manager.export_to_csv_stream(document_ids, user_id, f)
+            except Exception:
+                if os.path.exists(export_path):
+                    os.unlink(export_path)
+                raise
+        elif export_format == 'excel':
+            # A failed workbook would leave a truncated .xlsx behind
+            try:
+                export_manager.export_to_excel(document_ids, user_id, output=export_path)
+            except Exception:
+                if os.path.exists(export_path):
+                    os.unlink(export_path)
+                raise
         else:
-            # It's a string (JSON)
-            with open(export_path, 'w') as f:
-                f.write(export_data)
+            try:
+                with open(export_path, 'w', encoding='utf-8') as f:
+                    export_manager.export_to_json_stream(document_ids, user_id, f,
+                                                         include_full_text=include_full_text)
+            except Exception:
+                if os.path.exists(export_path):
+                    os.unlink(export_path)
+                raise
         
-        client.close()
+        progress.update_progress(3, "Export completed successfully")
         
         return {
             "success": True,
@@ -1,46 +1,196 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from dotenv import load_dotenv
+
+def _env(key, default):
+    """Read an environment override (uncached, so runtime changes are seen)"""
+    return os.environ.get(key, default)
 
 # Base paths
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-MODELS_DIR = os.path.join(BASE_DIR, 'models')
-LOGS_DIR = os.path.join(BASE_DIR, 'logs')
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# Settings below are read from the environment at import, and this module is
+# imported before the entry points call load_dotenv(), so apply .env here
+# (variables already set in the process environment still win)
+load_dotenv(BASE_DIR / '.env')
+DATA_DIR = BASE_DIR / 'data'
+MODELS_DIR = BASE_DIR / 'models'
+LOGS_DIR = BASE_DIR / 'logs'
 
 # Data paths
-RAW_DOCUMENTS_DIR = os.path.join(DATA_DIR, 'raw_documents')
-TRAINING_DATA_DIR = os.path.join(DATA_DIR, 'training_data')
-PROCESSED_DIR = os.path.join(DATA_DIR, 'processed')
-PREVIEWS_DIR = os.path.join(DATA_DIR, 'previews')
-EXPORTS_DIR = os.path.join(DATA_DIR, 'exports')
+RAW_DOCUMENTS_DIR = DATA_DIR / 'raw_documents'
+TRAINING_DATA_DIR = DATA_DIR / 'training_data'
+PROCESSED_DIR = DATA_DIR / 'processed'
+PREVIEWS_DIR = DATA_DIR / 'previews'
+EXPORTS_DIR = DATA_DIR / 'exports'
 
 # Model paths
-DEFAULT_MODEL_PATH = os.path.join(MODELS_DIR, 'document_classifier_modified_before_one_night.joblib')
+DEFAULT_MODEL_PATH = MODELS_DIR / 'document_classifier_modified_before_one_night.joblib'
+
+# String forms for callers that need str paths. BASE_DIR is already absolute and
+# normalised, so plain concatenation with os.sep matches os.path.join
+BASE_DIR_STR = str(BASE_DIR)
+_P = BASE_DIR_STR + os.sep
+DATA_DIR_STR = _P + 'data'
+MODELS_DIR_STR = _P + 'models'
+LOGS_DIR_STR = _P + 'logs'
+_D = DATA_DIR_STR + os.sep
+RAW_DOCUMENTS_DIR_STR = _D + 'raw_documents'
+TRAINING_DATA_DIR_STR = _D + 'training_data'
+PROCESSED_DIR_STR = _D + 'processed'
+PREVIEWS_DIR_STR = _D + 'previews'
+EXPORTS_DIR_STR = _D + 'exports'
+DEFAULT_MODEL_PATH_STR = MODELS_DIR_STR + os.sep + 'document_classifier_modified_before_one_night.joblib'
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Immutable application settings; new code should read fields from get_config()"""
+    # API settings
+    api_host: str = '0.0.0.0'
+    api_port: int = 5000
+
+    # MongoDB wire compression, in order of preference. zlib is built in; set
+    # MONGODB_COMPRESSORS=zstd,zlib once zstandard is installed
+    mongodb_compressors: str = "zlib"
+
+    # Rate Limiting
+    rate_limit_storage_url: str = "redis://localhost:6379/0"
+    default_rate_limits: tuple = ("200 per day", "50 per hour")
+
+    # Celery Configuration
+    celery_broker_url: str = "redis://localhost:6379/0"
+    celery_result_backend: str = "redis://localhost:6379/1"
+
+    # Search Configuration
+    max_search_results: int = 1000
+    search_page_size: int = 20
+
+    # Preview Configuration
+    thumbnail_size: tuple = (200, 280)
+    preview_size: tuple = (800, 1120)
+    # Draw born-digital PDF previews from the text layer instead of rasterizing
+    lightweight_pdf_previews: bool = False
+
+    # Export Configuration
+    max_export_documents: int = 1000
+    export_retention_days: int = 7
+
+def get_config():
+    """Build the settings from the current environment; cheap enough to call per use"""
+    defaults = Config()
+    return Config(
+        api_host=_env('API_HOST', defaults.api_host),
+        api_port=int(_env('API_PORT', str(defaults.api_port))),
+        mongodb_compressors=_env('MONGODB_COMPRESSORS', defaults.mongodb_compressors),
+        lightweight_pdf_previews=_env('LIGHTWEIGHT_PDF_PREVIEWS', '0') == '1',
+        rate_limit_storage_url=_env('RATE_LIMIT_STORAGE_URL', defaults.rate_limit_storage_url),
+        celery_broker_url=_env('CELERY_BROKER_URL', defaults.celery_broker_url),
+        celery_result_backend=_env('CELERY_RESULT_BACKEND', defaults.celery_result_backend),
+    )
+
+CONFIG = get_config()
+
+# Module-level aliases kept for existing imports; a snapshot taken at import,
+# so code that must honour later environment changes calls get_config()
+API_HOST = CONFIG.api_host
+API_PORT = CONFIG.api_port
+RATE_LIMIT_STORAGE_URL = CONFIG.rate_limit_storage_url
+DEFAULT_RATE_LIMITS = list(CONFIG.default_rate_limits)
+CELERY_BROKER_URL = CONFIG.celery_broker_url
+CELERY_RESULT_BACKEND = CONFIG.celery_result_backend
+MAX_SEARCH_RESULTS = CONFIG.max_search_results
+SEARCH_PAGE_SIZE = CONFIG.search_page_size
+THUMBNAIL_SIZE = CONFIG.thumbnail_size
+PREVIEW_SIZE = CONFIG.preview_size
+MAX_EXPORT_DOCUMENTS = CONFIG.max_export_documents
+EXPORT_RETENTION_DAYS = CONFIG.export_retention_days
+
+# Directories created on demand by ensure_dirs()/ensure_all_dirs()
+_PATHS = {
+    'DATA_DIR': DATA_DIR,
+    'MODELS_DIR': MODELS_DIR,
+    'LOGS_DIR': LOGS_DIR,
+    'RAW_DOCUMENTS_DIR': RAW_DOCUMENTS_DIR,
+    'TRAINING_DATA_DIR': TRAINING_DATA_DIR,
+    'PROCESSED_DIR': PROCESSED_DIR,
+    'PREVIEWS_DIR': PREVIEWS_DIR,
+    'EXPORTS_DIR': EXPORTS_DIR,
+}
+# DATA_DIR is left out: it is created as the parent of its subdirectories
+_LEAF_DIRS = ('MODELS_DIR', 'LOGS_DIR', 'RAW_DOCUMENTS_DIR', 'TRAINING_DATA_DIR',
+              'PROCESSED_DIR', 'PREVIEWS_DIR', 'EXPORTS_DIR')
+_created = set()
+_DIRS_READY = BASE_DIR / '.dirs_ready'
+
+def _existing_children(parent):
+    """Names of entries under parent (one getdents call), or None if parent is missing"""
+    try:
+        with os.scandir(parent) as it:
+            return {entry.name for entry in it}
+    except FileNotFoundError:
+        return None
+
+def _mkdir(path):
+    try:
+        os.mkdir(path)
+    except FileExistsError:
+        pass
 
-# API settings
-API_HOST = '0.0.0.0'
-API_PORT = 5000
+def ensure_dirs(*names):
+    """Create the named directories (keys of _PATHS) if not already done in this process"""
+    pending = [name for name in names if name not in _created]
+    if not pending:
+        return
 
-# Rate Limiting
-RATE_LIMIT_STORAGE_URL = "redis://localhost:6379/0"
-DEFAULT_RATE_LIMITS = ["200 per day", "50 per hour"]
+    # Group by parent so an already-initialised tree costs one scandir per parent
+    # instead of a failing mkdir per directory
+    by_parent = {}
+    for name in pending:
+        by_parent.setdefault(_PATHS[name].parent, []).append(name)
 
-# Celery Configuration
-CELERY_BROKER_URL = "redis://localhost:6379/0"
-CELERY_RESULT_BACKEND = "redis://localhost:6379/1"
+    missing = []
+    for parent in sorted(by_parent, key=lambda p: len(p.parts)):
+        existing = _existing_children(parent)
+        if existing is None:
+            os.makedirs(parent, exist_ok=True)
+            existing = set()
+        missing.extend(_PATHS[name] for name in by_parent[parent]
+                       if _PATHS[name].name not in existing)
 
-# Search Configuration
-MAX_SEARCH_RESULTS = 1000
-SEARCH_PAGE_SIZE = 20
+    # mkdir releases the GIL, so on slow (network/bind-mounted) filesystems
+    # overlapping the calls hides most of their latency
+    if len(missing) >= 4 and os.environ.get('LLM_FS_PARALLEL_INIT', '1') == '1':
+        with ThreadPoolExecutor(max_workers=min(8, len(missing))) as executor:
+            list(executor.map(_mkdir, missing))
+    else:
+        for path in missing:
+            _mkdir(path)
+    _created.update(pending)
 
-# Preview Configuration
-THUMBNAIL_SIZE = (200, 280)
-PREVIEW_SIZE = (800, 1120)
+@cache
+def ensure(path):
+    """Create path (and any parents) the first time it is requested in this process, then return it"""
+    os.makedirs(path, exist_ok=True)
+    return path
 
-# Export Configuration
-MAX_EXPORT_DOCUMENTS = 1000
-EXPORT_RETENTION_DAYS = 7
+def ensure_all_dirs(force=False):
+    """Create every project directory; call once at application startup.
 
-# Ensure directories exist
-for directory in [DATA_DIR, MODELS_DIR, LOGS_DIR, RAW_DOCUMENTS_DIR, 
-                 TRAINING_DATA_DIR, PROCESSED_DIR, PREVIEWS_DIR, EXPORTS_DIR]:
-    os.makedirs(directory, exist_ok=True)
\ No newline at end of file
+    Skipped under pytest or when LLM_DOC_PARSER_SKIP_DIR_INIT is set, so test runs
+    and read-only invocations do no filesystem work. Integration tests that need
+    the directories should call ensure_all_dirs(force=True).
+    """
+    if not force and (os.environ.get('PYTEST_CURRENT_TEST') or os.environ.get('LLM_DOC_PARSER_SKIP_DIR_INIT')):
+        return
+    # A previous run left the sentinel: one stat (plus a spot check) instead of a scan
+    if _DIRS_READY.exists() and os.path.isdir(EXPORTS_DIR):
+        _created.update(_LEAF_DIRS)
+        return
+    ensure_dirs(*_LEAF_DIRS)
+    try:
+        _DIRS_READY.touch()
+    except OSError:
+        pass
@@ -6,7 +6,10 @@ import logging
 from PIL import Image, ImageDraw, ImageFont
 import io
 import base64
+import mmap
 import sys
+import threading
+from collections import OrderedDict
 
 # Fix Windows encoding issues
 if sys.platform == "win32":
@@ -34,6 +37,17 @@ try:
 except ImportError as e:
     print("⚠ PyMuPDF not available. Install with: pip install PyMuPDF")
 
+# Lightweight PDF previews are drawn from the text layer when text blocks cover
+# at least this share of page 1 and embedded images stay below the image share
+TEXT_PREVIEW_MIN_COVERAGE = 0.15
+TEXT_PREVIEW_MAX_IMAGE_COVERAGE = 0.5
+
+# Encoded thumbnail data URIs kept per generator, keyed on (path, mtime)
+THUMBNAIL_CACHE_SIZE = 256
+
+# Preview URL lookups kept per generator, keyed on (document_id, previews dir mtime)
+PREVIEW_URL_CACHE_SIZE = 1024
+
 class DocumentPreviewGenerator:
     def __init__(self, previews_dir: str = "data/previews"):
         self.previews_dir = Path(previews_dir)
@@ -41,6 +55,10 @@ class DocumentPreviewGenerator:
         self.logger = logging.getLogger(__name__)
         self.thumbnail_size = (200, 280)  # Standard thumbnail size
         self.preview_size = (800, 1120)   # Standard preview size
+        # LRU caches shared by the API server's request threads
+        self._base64_cache = OrderedDict()
+        self._preview_url_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         # Log available features
         if HAS_PDF2IMAGE or HAS_PYMUPDF:
@@ -49,11 +67,18 @@ class DocumentPreviewGenerator:
             self.logger.warning("No PDF processing libraries available. Using placeholder images only.")
 
     def generate_pdf_preview(self, pdf_path: str, document_id: str, 
-                           generate_thumbnail: bool = True) -> Tuple[Optional[str], Optional[str]]:
+                           generate_thumbnail: bool = True,
+                           lightweight: bool = False,
+                           doc=None) -> Tuple[Optional[str], Optional[str]]:
         """
         Generate preview and thumbnail for PDF document
         Returns (preview_path, thumbnail_path)
+        
+        With lightweight=True, born-digital PDFs get a preview drawn from their
+        text layer instead of a rasterized page. An already open fitz.Document
+        can be passed as doc; it is left open for the caller to close
         """
+        owned_doc = None
         try:
             # Check if PDF processing is available
             if not HAS_PDF2IMAGE and not HAS_PYMUPDF:
@@ -63,6 +88,21 @@ class DocumentPreviewGenerator:
             preview_path = None
             thumbnail_path = None
             
+            # Lightweight previews go through PyMuPDF first so text pages skip rendering
+            if lightweight and HAS_PYMUPDF:
+                try:
+                    # Hold the document so the PyMuPDF fallback below reuses it
+                    if doc is None and os.path.exists(pdf_path):
+                        doc = owned_doc = fitz.open(pdf_path)
+                    preview_path, thumbnail_path = self._generate_with_pymupdf(
+                        pdf_path, document_id, generate_thumbnail, lightweight=True, doc=doc
+                    )
+                    if preview_path:
+                        self.logger.info(f"✓ PDF preview generated with PyMuPDF: {document_id}")
+                        return preview_path, thumbnail_path
+                except Exception as e:
+                    self.logger.warning(f"Lightweight PyMuPDF preview failed: {e}")
+            
             # Method 1: Use pdf2image (better quality)
             if HAS_PDF2IMAGE:
                 try:
@@ -79,7 +119,7 @@ class DocumentPreviewGenerator:
             if HAS_PYMUPDF and (preview_path is None):
                 try:
                     preview_path, thumbnail_path = self._generate_with_pymupdf(
-                        pdf_path, document_id, generate_thumbnail
+                        pdf_path, document_id, generate_thumbnail, doc=doc
                     )
                     if preview_path:
                         self.logger.info(f"✓ PDF preview generated with PyMuPDF: {document_id}")
@@ -94,6 +134,9 @@ class DocumentPreviewGenerator:
         except Exception as e:
             self.logger.error(f"Error generating PDF preview for {pdf_path}: {e}")
             return self._generate_placeholder(pdf_path, document_id, "PDF")
+        finally:
+            if owned_doc is not None:
+                owned_doc.close()
 
     def _generate_with_pdf2image(self, pdf_path: str, document_id: str, 
                                generate_thumbnail: bool) -> Tuple[Optional[str], Optional[str]]:
@@ -127,11 +170,10 @@ class DocumentPreviewGenerator:
             # Generate thumbnail
             thumbnail_path = None
             if generate_thumbnail:
-                thumbnail = preview_image.copy()
-                thumbnail.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
+                preview_image.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
                 thumbnail_filename = f"{document_id}_thumbnail.png"
                 thumbnail_path = self.previews_dir / thumbnail_filename
-                thumbnail.save(thumbnail_path, "PNG", quality=80, optimize=True)
+                preview_image.save(thumbnail_path, "PNG", quality=80, optimize=True)
             
             return str(preview_path), str(thumbnail_path) if thumbnail_path else None
             
@@ -140,24 +182,34 @@ class DocumentPreviewGenerator:
             return None, None
 
     def _generate_with_pymupdf(self, pdf_path: str, document_id: str,
-                             generate_thumbnail: bool) -> Tuple[Optional[str], Optional[str]]:
-        """Generate preview using PyMuPDF"""
+                             generate_thumbnail: bool,
+                             lightweight: bool = False,
+                             doc=None) -> Tuple[Optional[str], Optional[str]]:
+        """Generate preview using PyMuPDF; a passed-in doc is not closed here"""
         try:
-            # Check if file exists and is readable
-            if not os.path.exists(pdf_path):
-                self.logger.error(f"PDF file not found: {pdf_path}")
-                return None, None
-            
-            doc = fitz.open(pdf_path)
+            if doc is None:
+                # Check if file exists and is readable
+                if not os.path.exists(pdf_path):
+                    self.logger.error(f"PDF file not found: {pdf_path}")
+                    return None, None
+                
+                with fitz.open(pdf_path) as owned_doc:
+                    return self._generate_with_pymupdf(
+                        pdf_path, document_id, generate_thumbnail, lightweight, doc=owned_doc
+                    )
             
             # Check if document has pages
             if len(doc) == 0:
                 self.logger.warning(f"PDF has no pages: {pdf_path}")
-                doc.close()
                 return None, None
             
             page = doc[0]
             
+            if lightweight:
+                lines = self._text_layer_lines(page)
+                if lines:
+                    return self._render_text_preview(lines, document_id, generate_thumbnail)
+            
             # Create preview with good quality
             mat = fitz.Matrix(2.0, 2.0)  # Zoom factor for better quality
             pix = page.get_pixmap(matrix=mat)
@@ -171,21 +223,88 @@ class DocumentPreviewGenerator:
             # Generate thumbnail
             thumbnail_path = None
             if generate_thumbnail:
-                # Create smaller version for thumbnail
-                mat_thumb = fitz.Matrix(0.5, 0.5)
-                pix_thumb = page.get_pixmap(matrix=mat_thumb)
+                # Downsample the preview raster rather than rendering the page again
+                mode = "RGBA" if pix.alpha else "RGB"
+                thumbnail = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+                thumbnail.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
                 
                 thumbnail_filename = f"{document_id}_thumbnail.png"
                 thumbnail_path = self.previews_dir / thumbnail_filename
-                pix_thumb.save(str(thumbnail_path))
+                thumbnail.save(thumbnail_path, "PNG")
             
-            doc.close()
             return str(preview_path), str(thumbnail_path) if thumbnail_path else None
             
         except Exception as e:
             self.logger.error(f"PyMuPDF conversion failed for {pdf_path}: {e}")
             return None, None
 
+    def _text_layer_lines(self, page) -> Optional[list]:
+        """
+        Return [(x, y, text)] for page lines scaled to the preview size, or None
+        when the page looks scanned and has to be rasterized
+        """
+        page_rect = page.rect
+        page_area = page_rect.width * page_rect.height
+        if page_area <= 0:
+            return None
+        
+        text_area = 0.0
+        image_area = 0.0
+        lines = []
+        scale_x = self.preview_size[0] / page_rect.width
+        scale_y = self.preview_size[1] / page_rect.height
+        
+        for block in page.get_text("dict")["blocks"]:
+            x0, y0, x1, y1 = block["bbox"]
+            area = (x1 - x0) * (y1 - y0)
+            if block.get("type") != 0:
+                image_area += area
+                continue
+            text_area += area
+            for line in block["lines"]:
+                text = "".join(span["text"] for span in line["spans"]).strip()
+                if text:
+                    lx, ly = line["bbox"][:2]
+                    lines.append((lx * scale_x, ly * scale_y, text))
+        
+        if (not lines or text_area / page_area < TEXT_PREVIEW_MIN_COVERAGE or
+                image_area / page_area > TEXT_PREVIEW_MAX_IMAGE_COVERAGE):
+            return None
+        return lines
+
+    def _load_fonts(self):
+        """Return (title_font, normal_font), falling back to PIL's default font"""
+        try:
+            # Try to use a larger font for title
+            return ImageFont.truetype("arial.ttf", 32), ImageFont.truetype("arial.ttf", 18)
+        except:
+            # Use default font
+            default_font = ImageFont.load_default()
+            return default_font, default_font
+
+    def _render_text_preview(self, lines: list, document_id: str,
+                             generate_thumbnail: bool) -> Tuple[Optional[str], Optional[str]]:
+        """Draw page text at its original positions instead of rasterizing the page"""
+        img = Image.new('RGB', self.preview_size, color='white')
+        draw = ImageDraw.Draw(img)
+        _, normal_font = self._load_fonts()
+        
+        for x, y, text in lines:
+            draw.text((x, y), text, fill='#212529', font=normal_font)
+        
+        preview_filename = f"{document_id}_preview.png"
+        preview_path = self.previews_dir / preview_filename
+        img.save(preview_path, "PNG")
+        
+        thumbnail_path = None
+        if generate_thumbnail:
+            img.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
+            thumbnail_filename = f"{document_id}_thumbnail.png"
+            thumbnail_path = self.previews_dir / thumbnail_filename
+            img.save(thumbnail_path, "PNG")
+        
+        return str(preview_path), str(thumbnail_path) if thumbnail_path else None
+
     def generate_image_preview(self, image_path: str, document_id: str,
                              generate_thumbnail: bool = True) -> Tuple[Optional[str], Optional[str]]:
         """Generate preview for image documents"""
@@ -214,16 +333,15 @@ class DocumentPreviewGenerator:
                 
                 preview_filename = f"{document_id}_preview.jpg"
                 preview_path = self.previews_dir / preview_filename
-                img.save(preview_path, "JPEG", quality=85, optimize=True)
+                img.save(preview_path, "JPEG", quality=85)
                 
-                # Generate thumbnail
+                # Generate thumbnail (the preview is already written, so shrink in place)
                 thumbnail_path = None
                 if generate_thumbnail:
-                    thumbnail = img.copy()
-                    thumbnail.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
+                    img.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
                     thumbnail_filename = f"{document_id}_thumbnail.jpg"
                     thumbnail_path = self.previews_dir / thumbnail_filename
-                    thumbnail.save(thumbnail_path, "JPEG", quality=80, optimize=True)
+                    img.save(thumbnail_path, "JPEG", quality=80)
                 
                 self.logger.info(f"✓ Image preview generated: {document_id}")
                 return str(preview_path), str(thumbnail_path) if thumbnail_path else None
@@ -241,14 +359,7 @@ class DocumentPreviewGenerator:
             draw = ImageDraw.Draw(img)
             
             # Try to load fonts, fallback to default
-            try:
-                # Try to use a larger font for title
-                title_font = ImageFont.truetype("arial.ttf", 32)
-                normal_font = ImageFont.truetype("arial.ttf", 18)
-            except:
-                # Use default font
-                title_font = ImageFont.load_default()
-                normal_font = ImageFont.load_default()
+            title_font, normal_font = self._load_fonts()
             
             # Draw decorative elements
             draw.rectangle([50, 50, self.preview_size[0]-50, self.preview_size[1]-50], 
@@ -301,8 +412,44 @@ class DocumentPreviewGenerator:
             # Last resort - return None values
             return None, None
 
+    def find_existing_preview(self, source_path: str, 
+                              document_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Return (preview_path, thumbnail_path) if previews for this document were
+        already generated after the source file was last modified, else (None, None)
+        """
+        try:
+            source_mtime = os.stat(source_path).st_mtime
+        except OSError:
+            return None, None
+        
+        for ext in ("png", "jpg"):
+            preview_path = self.previews_dir / f"{document_id}_preview.{ext}"
+            thumbnail_path = self.previews_dir / f"{document_id}_thumbnail.{ext}"
+            try:
+                if (preview_path.stat().st_mtime > source_mtime and
+                        thumbnail_path.stat().st_mtime > source_mtime):
+                    return str(preview_path), str(thumbnail_path)
+            except OSError:
+                continue
+        
+        return None, None
+
     def get_preview_urls(self, document_id: str) -> Dict[str, Optional[str]]:
         """Get URLs for document preview and thumbnail"""
+        # Adding or removing a preview file bumps the directory mtime, so one stat
+        # of the directory stands in for the per-file existence checks below
+        try:
+            key = (document_id, self.previews_dir.stat().st_mtime_ns)
+        except OSError:
+            key = None
+        if key:
+            with self._cache_lock:
+                cached = self._preview_url_cache.get(key)
+                if cached is not None:
+                    self._preview_url_cache.move_to_end(key)
+                    return dict(cached)
+        
         # Check for PNG versions first
         preview_path = self.previews_dir / f"{document_id}_preview.png"
         thumbnail_path = self.previews_dir / f"{document_id}_thumbnail.png"
@@ -313,12 +460,21 @@ class DocumentPreviewGenerator:
         if not thumbnail_path.exists():
             thumbnail_path = self.previews_dir / f"{document_id}_thumbnail.jpg"
         
-        return {
-            "preview_url": f"/api/previews/{document_id}/preview" if preview_path.exists() else None,
-            "thumbnail_url": f"/api/previews/{document_id}/thumbnail" if thumbnail_path.exists() else None,
-            "preview_exists": preview_path.exists(),
-            "thumbnail_exists": thumbnail_path.exists()
+        preview_exists = preview_path.exists()
+        thumbnail_exists = thumbnail_path.exists()
+        urls = {
+            "preview_url": f"/api/previews/{document_id}/preview" if preview_exists else None,
+            "thumbnail_url": f"/api/previews/{document_id}/thumbnail" if thumbnail_exists else None,
+            "preview_exists": preview_exists,
+            "thumbnail_exists": thumbnail_exists
         }
+        
+        if key:
+            with self._cache_lock:
+                self._preview_url_cache[key] = urls
+                if len(self._preview_url_cache) > PREVIEW_URL_CACHE_SIZE:
+                    self._preview_url_cache.popitem(last=False)
+        return dict(urls)
 
     def generate_base64_thumbnail(self, document_id: str) -> Optional[str]:
         """Generate base64 encoded thumbnail for immediate frontend display"""
@@ -329,19 +485,38 @@ class DocumentPreviewGenerator:
                 # Try JPG
                 thumbnail_path = self.previews_dir / f"{document_id}_thumbnail.jpg"
             
-            if thumbnail_path.exists():
-                with open(thumbnail_path, "rb") as img_file:
-                    encoded_string = base64.b64encode(img_file.read()).decode('utf-8')
-                    
-                # Determine MIME type
-                if thumbnail_path.suffix.lower() == '.jpg':
-                    mime_type = 'jpeg'
-                else:
-                    mime_type = 'png'
-                    
-                return f"data:image/{mime_type};base64,{encoded_string}"
-            
-            return None
+            try:
+                stat = thumbnail_path.stat()
+            except OSError:
+                return None
+            
+            key = (str(thumbnail_path), stat.st_mtime_ns)
+            with self._cache_lock:
+                cached = self._base64_cache.get(key)
+                if cached is not None:
+                    self._base64_cache.move_to_end(key)
+                    return cached
+            
+            if stat.st_size == 0:
+                return None
+            
+            # Encode straight from the mapped file instead of reading it into a buffer first
+            with open(thumbnail_path, "rb") as img_file, \
+                    mmap.mmap(img_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                encoded_string = base64.b64encode(mapped).decode('ascii')
+                
+            # Determine MIME type
+            if thumbnail_path.suffix.lower() == '.jpg':
+                mime_type = 'jpeg'
+            else:
+                mime_type = 'png'
+            
+            data_uri = f"data:image/{mime_type};base64,{encoded_string}"
+            with self._cache_lock:
+                self._base64_cache[key] = data_uri
+                if len(self._base64_cache) > THUMBNAIL_CACHE_SIZE:
+                    self._base64_cache.popitem(last=False)
+            return data_uri
             
         except Exception as e:
             self.logger.error(f"Error generating base64 thumbnail for {document_id}: {e}")
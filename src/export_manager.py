@@ -1,235 +1,422 @@
-import pandas as pd
 import json
 import csv
+import re
 import io
+import queue
+import threading
+import zipfile
 from datetime import datetime
 from typing import List, Dict, Any
+import bson
 from bson import ObjectId
 import logging
 from pathlib import Path
+from openpyxl import Workbook
+
+try:
+    import xlsxwriter
+    HAS_XLSXWRITER = True
+except ImportError:
+    HAS_XLSXWRITER = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Hex string form of a BSON ObjectId
+_OID_RE = re.compile(r'[0-9a-fA-F]{24}')
+
+# Documents fetched per cursor round trip while exporting
+EXPORT_BATCH_SIZE = 500
+
+# Maximum characters Excel stores in a single cell
+EXCEL_CELL_LIMIT = 32767
+
+# Decoded batches the background fetcher may hold ahead of the writer
+PREFETCH_BATCHES = 2
+
+# Documents per part accepted by export_to_zip_segments
+MIN_SEGMENT_SIZE = 10
+MAX_SEGMENT_SIZE = 1000
+
+# Marks the end of the prefetched batches
+_DONE = object()
+
+# Fields read by each exporter; other BSON fields are neither sent nor decoded
+_DOCUMENT_INFO_FIELDS = {'document_id': 1, 'filename': 1, 'document_type': 1, 'file_type': 1,
+                         'file_size': 1, 'created_at': 1, 'processing_time': 1}
+CSV_PROJECTION = {**_DOCUMENT_INFO_FIELDS, 'extraction_data.patterns': 1,
+                  'extraction_data.contacts': 1, 'extraction_data.names': 1}
+EXCEL_PROJECTION = {**_DOCUMENT_INFO_FIELDS, 'extraction_data.patterns': 1,
+                    'extraction_data.contacts': 1, 'text_preview': 1}
+# JSON exports every field; include_full_text=False opts into this projection,
+# which leaves out the (potentially large) full_text
+JSON_PROJECTION = {'full_text': 0}
+
+def _json_default(value):
+    """Serialize datetimes as ISO 8601 and ObjectIds (or anything else) as strings"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _encode_document(doc: Dict, pretty: bool = False) -> str:
+    """Encode one exported document, with orjson when it is installed"""
+    if HAS_ORJSON:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(doc, default=_json_default, option=option).decode('utf-8')
+    return json.dumps(doc, indent=2 if pretty else None, ensure_ascii=False, default=_json_default)
+
+class _XlsxWriterSheet:
+    """Append-only adapter giving an xlsxwriter worksheet openpyxl's append()"""
+    __slots__ = ('worksheet', 'row')
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.row = 0
+
+    def append(self, values):
+        self.worksheet.write_row(self.row, 0, values)
+        self.row += 1
 
 class ExportManager:
     def __init__(self, db_connection):
         self.db = db_connection
         self.logger = logging.getLogger(__name__)
 
+    def _object_ids(self, document_ids: List[str]) -> List[ObjectId]:
+        """Convert the well-formed IDs to ObjectIds, logging how many were rejected"""
+        object_ids = [ObjectId(doc_id) for doc_id in document_ids
+                      if isinstance(doc_id, str) and _OID_RE.fullmatch(doc_id)]
+        invalid_count = len(document_ids) - len(object_ids)
+        if invalid_count:
+            self.logger.warning(f"Skipped {invalid_count} invalid document IDs")
+        return object_ids
+
+    def _export_query(self, document_ids: List[str], user_id: str) -> Dict:
+        """Query matching the user's documents among the valid IDs"""
+        object_ids = self._object_ids(document_ids)
+        if not object_ids:
+            raise ValueError("No valid document IDs provided")
+        return {"_id": {"$in": object_ids}, "user_id": user_id}
+
+    def _fetch_documents(self, document_ids: List[str], user_id: str,
+                         projection: Dict[str, int] = None):
+        """Validate the IDs now and return a lazy stream of the matching documents"""
+        return self._find(self._export_query(document_ids, user_id), projection)
+
+    def _find(self, query: Dict, projection: Dict[str, int] = None):
+        """Yield matching documents, fetched in EXPORT_BATCH_SIZE batches
+        
+        A background thread fetches raw BSON batches and decodes each in one
+        call while the caller writes the previous batch, hiding the Mongo round
+        trips behind row writing.
+        """
+        batches = queue.Queue(maxsize=PREFETCH_BATCHES)
+        stop = threading.Event()
+        
+        def put(item) -> bool:
+            # Give up once the consumer has gone away instead of blocking forever
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                collection = self.db.parsed_documents
+                for batch in collection.find_raw_batches(query, projection, batch_size=EXPORT_BATCH_SIZE):
+                    if not put(bson.decode_all(batch, collection.codec_options)):
+                        return
+                put(_DONE)
+            except Exception as e:
+                put(e)
+        
+        threading.Thread(target=produce, name="export-prefetch", daemon=True).start()
+        try:
+            while True:
+                item = batches.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield from item
+        finally:
+            stop.set()
+
+    def _csv_row(self, doc: Dict) -> Dict[str, Any]:
+        """Flatten a parsed document into a CSV row"""
+        created_at = doc.get('created_at')
+        row = {
+            'document_id': doc.get('document_id', ''),
+            'filename': doc.get('filename', ''),
+            'document_type': doc.get('document_type', ''),
+            'file_type': doc.get('file_type', ''),
+            'file_size': doc.get('file_size', 0),
+            'created_at': created_at.isoformat() if created_at else '',
+            'processing_time': doc.get('processing_time', ''),
+        }
+        
+        # Add extraction data
+        extraction = doc.get('extraction_data') or {}
+        for key, value in (extraction.get('patterns') or {}).items():
+            if value:
+                row[f'pattern_{key}'] = ', '.join(value) if type(value) is list else str(value)
+        
+        for key, value in (extraction.get('contacts') or {}).items():
+            if value:
+                row[f'contact_{key}'] = ', '.join(value) if type(value) is list else str(value)
+        
+        names = extraction.get('names')
+        if names:
+            primary_name = names.get('primary_name')
+            if primary_name:
+                row['primary_name'] = primary_name
+            candidate_names = names.get('candidate_names')
+            if candidate_names:
+                row['candidate_names'] = ', '.join(candidate_names)
+        
+        return row
+
     def export_to_csv(self, document_ids: List[str], user_id: str) -> io.StringIO:
-        """Export documents to CSV format - FIXED VERSION"""
+        """Export documents to CSV format in memory
+        
+        Rows are streamed from the cursor through export_to_csv_stream; prefer
+        calling that directly with a file when the export goes to disk.
+        """
+        output = io.StringIO()
+        self.export_to_csv_stream(document_ids, user_id, output)
+        output.seek(0)
+        return output
+
+    def export_to_csv_stream(self, document_ids: List[str], user_id: str, output_fh) -> int:
+        """Export documents as CSV rows written directly to an open text file
+        
+        Makes one pass over the matching documents to discover the dynamic
+        columns and a second pass writing rows, so only one row is held in
+        memory at a time. Returns the number of rows written.
+        """
         try:
-            # Convert string IDs to ObjectId
-            object_ids = []
-            for doc_id in document_ids:
-                try:
-                    object_ids.append(ObjectId(doc_id))
-                except:
-                    self.logger.warning(f"Invalid document ID: {doc_id}")
-            
-            if not object_ids:
-                raise ValueError("No valid document IDs provided")
+            query = self._export_query(document_ids, user_id)
             
-            # Fetch documents
-            documents = list(self.db.parsed_documents.find({
-                "_id": {"$in": object_ids},
-                "user_id": user_id
-            }))
+            # First pass: collect column names in order of first appearance
+            fieldnames = {}
+            for doc in self._find(query, CSV_PROJECTION):
+                fieldnames.update(dict.fromkeys(self._csv_row(doc)))
             
-            if not documents:
+            if not fieldnames:
                 raise ValueError("No documents found for export")
             
-            self.logger.info(f"Exporting {len(documents)} documents to CSV for user {user_id}")
+            # Second pass: write each row as it arrives from the cursor
+            writer = csv.DictWriter(output_fh, fieldnames=list(fieldnames), restval='')
+            writer.writeheader()
+            row_count = 0
+            for doc in self._find(query, CSV_PROJECTION):
+                writer.writerow(self._csv_row(doc))
+                row_count += 1
             
-            # Prepare data for CSV
-            csv_data = []
-            for doc in documents:
-                row = {
-                    'document_id': doc.get('document_id', ''),
-                    'filename': doc.get('filename', ''),
-                    'document_type': doc.get('document_type', ''),
-                    'file_type': doc.get('file_type', ''),
-                    'file_size': doc.get('file_size', 0),
-                    'created_at': doc.get('created_at', '').isoformat() if doc.get('created_at') else '',
-                    'processing_time': doc.get('processing_time', ''),
-                }
-                
-                # Add extraction data
-                extraction = doc.get('extraction_data', {})
-                if extraction.get('patterns'):
-                    for key, value in extraction['patterns'].items():
-                        if value:
-                            row[f'pattern_{key}'] = ', '.join(value) if isinstance(value, list) else str(value)
-                
-                if extraction.get('contacts'):
-                    for key, value in extraction['contacts'].items():
-                        if value:
-                            row[f'contact_{key}'] = ', '.join(value) if isinstance(value, list) else str(value)
-                
-                if extraction.get('names'):
-                    names = extraction.get('names', {})
-                    if names.get('primary_name'):
-                        row['primary_name'] = names['primary_name']
-                    if names.get('candidate_names'):
-                        row['candidate_names'] = ', '.join(names['candidate_names'])
-                
-                csv_data.append(row)
-            
-            # Create CSV in memory
-            output = io.StringIO()
-            if csv_data:
-                df = pd.DataFrame(csv_data)
-                df.to_csv(output, index=False, encoding='utf-8')
-            
-            output.seek(0)
-            return output
+            self.logger.info(f"Exported {row_count} documents to CSV for user {user_id}")
+            return row_count
             
         except Exception as e:
             self.logger.error(f"CSV export error: {e}")
             raise
 
-    def export_to_excel(self, document_ids: List[str], user_id: str) -> io.BytesIO:
-        """Export documents to Excel format with multiple sheets - FIXED VERSION"""
+    def export_to_excel(self, document_ids: List[str], user_id: str, output=None):
+        """Export documents to Excel format with multiple sheets
+        
+        Pass a file path or binary file object as output to write the workbook
+        there directly; otherwise it is returned in a BytesIO.
+        """
         try:
-            object_ids = []
-            for doc_id in document_ids:
-                try:
-                    object_ids.append(ObjectId(doc_id))
-                except:
-                    continue
+            documents = self._fetch_documents(document_ids, user_id, EXCEL_PROJECTION)
             
-            if not object_ids:
-                raise ValueError("No valid document IDs provided")
-                
-            documents = list(self.db.parsed_documents.find({
-                "_id": {"$in": object_ids},
-                "user_id": user_id
-            }))
+            sheet_names = ('Document Info', 'Extraction Patterns', 'Contact Info', 'Text Preview')
+            target = output if output is not None else io.BytesIO()
             
-            if not documents:
-                raise ValueError("No documents found for export")
+            # Rows are serialized as they are appended instead of being held as
+            # cell objects: xlsxwriter's constant_memory mode flushes each row,
+            # openpyxl's write-only mode is the fallback
+            if HAS_XLSXWRITER:
+                workbook = xlsxwriter.Workbook(target, {'constant_memory': True, 'use_zip64': True})
+                sheets = [_XlsxWriterSheet(workbook.add_worksheet(name)) for name in sheet_names]
+            else:
+                workbook = Workbook(write_only=True)
+                sheets = [workbook.create_sheet(name) for name in sheet_names]
+            main_sheet, pattern_sheet, contact_sheet, text_sheet = sheets
             
-            self.logger.info(f"Exporting {len(documents)} documents to Excel for user {user_id}")
-            
-            # Create Excel writer
-            output = io.BytesIO()
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                # Main document info sheet
-                main_data = []
-                for doc in documents:
-                    main_data.append({
-                        'Document ID': doc.get('document_id', ''),
-                        'Filename': doc.get('filename', ''),
-                        'Document Type': doc.get('document_type', ''),
-                        'File Type': doc.get('file_type', ''),
-                        'File Size (bytes)': doc.get('file_size', 0),
-                        'Created At': doc.get('created_at', '').isoformat() if doc.get('created_at') else '',
-                        'Processing Time (s)': doc.get('processing_time', ''),
-                    })
-                
-                if main_data:
-                    pd.DataFrame(main_data).to_excel(writer, sheet_name='Document Info', index=False)
-                
-                # Extraction patterns sheet
-                pattern_data = []
-                for doc in documents:
-                    extraction = doc.get('extraction_data', {})
-                    patterns = extraction.get('patterns', {})
-                    
-                    for pattern_key, pattern_values in patterns.items():
-                        if pattern_values:
-                            pattern_data.append({
-                                'Document ID': doc.get('document_id', ''),
-                                'Filename': doc.get('filename', ''),
-                                'Pattern Type': pattern_key,
-                                'Values': ', '.join(pattern_values) if isinstance(pattern_values, list) else str(pattern_values)
-                            })
-                
-                if pattern_data:
-                    pd.DataFrame(pattern_data).to_excel(writer, sheet_name='Extraction Patterns', index=False)
+            main_sheet.append(('Document ID', 'Filename', 'Document Type', 'File Type',
+                               'File Size (bytes)', 'Created At', 'Processing Time (s)'))
+            pattern_sheet.append(('Document ID', 'Filename', 'Pattern Type', 'Values'))
+            contact_sheet.append(('Document ID', 'Filename', 'Contact Type', 'Values'))
+            text_sheet.append(('Document ID', 'Filename', 'Text Preview'))
+            
+            document_count = 0
+            
+            # Fill all four sheets in a single pass over the cursor
+            for doc in documents:
+                document_count += 1
+                document_id = doc.get('document_id', '')
+                filename = doc.get('filename', '')
+                extraction = doc.get('extraction_data') or {}
+                created_at = doc.get('created_at')
                 
-                # Contact information sheet
-                contact_data = []
-                for doc in documents:
-                    extraction = doc.get('extraction_data', {})
-                    contacts = extraction.get('contacts', {})
-                    
-                    for contact_key, contact_values in contacts.items():
-                        if contact_values:
-                            contact_data.append({
-                                'Document ID': doc.get('document_id', ''),
-                                'Filename': doc.get('filename', ''),
-                                'Contact Type': contact_key,
-                                'Values': ', '.join(contact_values) if isinstance(contact_values, list) else str(contact_values)
-                            })
+                main_sheet.append((
+                    document_id,
+                    filename,
+                    doc.get('document_type', ''),
+                    doc.get('file_type', ''),
+                    doc.get('file_size', 0),
+                    created_at.isoformat() if created_at else '',
+                    doc.get('processing_time', ''),
+                ))
                 
-                if contact_data:
-                    pd.DataFrame(contact_data).to_excel(writer, sheet_name='Contact Info', index=False)
+                for pattern_key, pattern_values in (extraction.get('patterns') or {}).items():
+                    if pattern_values:
+                        pattern_sheet.append((
+                            document_id, filename, pattern_key,
+                            ', '.join(pattern_values) if type(pattern_values) is list else str(pattern_values)
+                        ))
                 
-                # Text preview sheet
-                text_data = []
-                for doc in documents:
-                    text_data.append({
-                        'Document ID': doc.get('document_id', ''),
-                        'Filename': doc.get('filename', ''),
-                        'Text Preview': doc.get('text_preview', '')[:32767]  # Excel cell limit
-                    })
+                for contact_key, contact_values in (extraction.get('contacts') or {}).items():
+                    if contact_values:
+                        contact_sheet.append((
+                            document_id, filename, contact_key,
+                            ', '.join(contact_values) if type(contact_values) is list else str(contact_values)
+                        ))
                 
-                if text_data:
-                    pd.DataFrame(text_data).to_excel(writer, sheet_name='Text Preview', index=False)
+                text_preview = doc.get('text_preview') or ''
+                if len(text_preview) > EXCEL_CELL_LIMIT:
+                    text_preview = text_preview[:EXCEL_CELL_LIMIT]
+                text_sheet.append((document_id, filename, text_preview))
+            
+            if not document_count:
+                raise ValueError("No documents found for export")
+            
+            self.logger.info(f"Exported {document_count} documents to Excel for user {user_id}")
             
-            output.seek(0)
-            return output
+            # xlsxwriter cannot drop a sheet once rows are flushed, so every
+            # export carries all four sheets, empty ones with just the header
+            if HAS_XLSXWRITER:
+                workbook.close()
+            else:
+                workbook.save(target)
+            
+            if output is None:
+                target.seek(0)
+            return target
             
         except Exception as e:
             self.logger.error(f"Excel export error: {e}")
             raise
 
-    def export_to_json(self, document_ids: List[str], user_id: str) -> str:
-        """Export documents to JSON format - FIXED VERSION"""
+    def export_to_json(self, document_ids: List[str], user_id: str, pretty: bool = False,
+                       include_full_text: bool = True) -> str:
+        """Export documents to JSON format in memory
+        
+        Documents are encoded one at a time through export_to_json_stream; prefer
+        calling that directly with a file when the export goes to disk.
+        """
+        output = io.StringIO()
+        self.export_to_json_stream(document_ids, user_id, output, pretty=pretty,
+                                   include_full_text=include_full_text)
+        return output.getvalue()
+
+    def export_to_json_stream(self, document_ids: List[str], user_id: str, output_fh,
+                              pretty: bool = False, include_full_text: bool = True) -> int:
+        """Export documents as JSON written directly to an open text file
+        
+        The export_info header is written first, then each document is encoded
+        as it arrives from the cursor, so only one document is held in memory
+        at a time. Returns the number of documents written.
+        """
         try:
-            object_ids = []
-            for doc_id in document_ids:
-                try:
-                    object_ids.append(ObjectId(doc_id))
-                except:
-                    continue
+            query = self._export_query(document_ids, user_id)
             
-            if not object_ids:
-                raise ValueError("No valid document IDs provided")
-                
-            documents = list(self.db.parsed_documents.find({
-                "_id": {"$in": object_ids},
-                "user_id": user_id
-            }))
-            
-            if not documents:
+            total_documents = self.db.parsed_documents.count_documents(query)
+            if not total_documents:
                 raise ValueError("No documents found for export")
             
-            self.logger.info(f"Exporting {len(documents)} documents to JSON for user {user_id}")
-            
-            # Convert ObjectId to string for JSON serialization
-            for doc in documents:
-                doc['_id'] = str(doc['_id'])
-                if doc.get('created_at'):
-                    doc['created_at'] = doc['created_at'].isoformat()
-                if doc.get('updated_at'):
-                    doc['updated_at'] = doc['updated_at'].isoformat()
-            
-            export_data = {
-                "export_info": {
-                    "export_date": datetime.now().isoformat(),
-                    "total_documents": len(documents),
-                    "format": "json",
-                    "version": "1.0"
-                },
-                "documents": documents
+            export_info = {
+                "export_date": datetime.now().isoformat(),
+                "total_documents": total_documents,
+                "format": "json",
+                "version": "1.0"
             }
             
-            return json.dumps(export_data, indent=2, ensure_ascii=False)
+            indent = 2 if pretty else None
+            output_fh.write('{"export_info": ')
+            output_fh.write(json.dumps(export_info, indent=indent, ensure_ascii=False))
+            output_fh.write(', "documents": [')
+            
+            document_count = 0
+            projection = None if include_full_text else JSON_PROJECTION
+            for doc in self._find(query, projection):
+                if document_count:
+                    output_fh.write(', ')
+                # ObjectId and datetime values are not JSON types
+                output_fh.write(_encode_document(doc, pretty))
+                document_count += 1
+            
+            output_fh.write(']}')
+            
+            self.logger.info(f"Exported {document_count} documents to JSON for user {user_id}")
+            return document_count
             
         except Exception as e:
             self.logger.error(f"JSON export error: {e}")
             raise
 
+    def export_to_zip_segments(self, document_ids: List[str], user_id: str, export_format: str,
+                               output, segment_size: int, include_full_text: bool = True) -> int:
+        """Export documents as a ZIP of export_part_NNN files of up to segment_size documents
+        
+        Each part is written into the archive as it is produced, so only one
+        segment is in flight at a time. output is a path or binary file object.
+        Returns the number of parts written.
+        """
+        extensions = {'csv': '.csv', 'excel': '.xlsx', 'json': '.json'}
+        if export_format not in extensions:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        if (isinstance(segment_size, bool) or not isinstance(segment_size, int)
+                or not MIN_SEGMENT_SIZE <= segment_size <= MAX_SEGMENT_SIZE):
+            raise ValueError(f"segment_size must be an integer from {MIN_SEGMENT_SIZE} to {MAX_SEGMENT_SIZE}")
+        
+        object_ids = [str(object_id) for object_id in self._object_ids(document_ids)]
+        if not object_ids:
+            raise ValueError("No valid document IDs provided")
+        
+        part_count = 0
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for start in range(0, len(object_ids), segment_size):
+                segment_ids = object_ids[start:start + segment_size]
+                part_name = f"export_part_{part_count + 1:03d}{extensions[export_format]}"
+                # A segment whose documents are all gone is left out of the archive
+                if not self.db.parsed_documents.count_documents(self._export_query(segment_ids, user_id)):
+                    continue
+                
+                with archive.open(part_name, 'w') as member:
+                    if export_format == 'excel':
+                        self.export_to_excel(segment_ids, user_id, output=member)
+                    else:
+                        with io.TextIOWrapper(member, encoding='utf-8', newline='') as text_member:
+                            if export_format == 'csv':
+                                self.export_to_csv_stream(segment_ids, user_id, text_member)
+                            else:
+                                self.export_to_json_stream(segment_ids, user_id, text_member,
+                                                           include_full_text=include_full_text)
+                part_count += 1
+        
+        if not part_count:
+            raise ValueError("No documents found for export")
+        
+        self.logger.info(f"Exported {part_count} {export_format} segments for user {user_id}")
+        return part_count
+
     def get_export_formats(self) -> List[Dict[str, str]]:
         """Get available export formats"""
         return [
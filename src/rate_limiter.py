@@ -2,39 +2,71 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask import request, jsonify
 import logging
-from functools import wraps
+from datetime import datetime
+from functools import lru_cache, wraps
+from src.config import get_config
+
+# Connections each worker keeps open to the Redis rate limit storage
+REDIS_MAX_CONNECTIONS = 32
+
+@lru_cache(maxsize=256)
+def _reset_iso(reset_at) -> str:
+    """ISO 8601 text for a window reset time; requests in a window share it"""
+    if isinstance(reset_at, datetime):
+        return reset_at.isoformat()
+    return datetime.fromtimestamp(reset_at).isoformat()
 
 class RateLimitManager:
     def __init__(self, app):
         self.app = app
+        self.logger = logging.getLogger(__name__)
+        
+        # Shared Redis counters keep limits global across workers; the moving
+        # window avoids the 2x burst a fixed window allows at its boundary
+        self.storage_uri = get_config().rate_limit_storage_url
+        if "://" not in self.storage_uri:
+            self.logger.warning("RATE_LIMIT_STORAGE_URL is not a storage URI; using in-memory rate limits")
+            self.storage_uri = "memory://"
+        storage_options = {}
+        if self.storage_uri.startswith(("redis://", "rediss://")):
+            storage_options["max_connections"] = REDIS_MAX_CONNECTIONS
+        
         self.limiter = Limiter(
             app=app,
             key_func=get_remote_address,
             default_limits=["200 per day", "50 per hour"],
-            storage_uri="memory://",  # In production, use Redis: "redis://localhost:6379"
-            strategy="fixed-window",
+            storage_uri=self.storage_uri,
+            storage_options=storage_options,
+            strategy="moving-window",
+            in_memory_fallback_enabled=True,
             on_breach=self.on_rate_limit_exceeded
         )
-        self.logger = logging.getLogger(__name__)
         self.setup_rate_limits()
 
     def setup_rate_limits(self):
-        """Configure specific rate limits for different endpoints"""
-        
-        # Authentication endpoints - stricter limits
-        self.limiter.limit("10 per minute")(self._get_auth_endpoints)
-        self.limiter.limit("5 per hour")(self._get_registration_endpoints)
-        
-        # Document processing - moderate limits
-        self.limiter.limit("30 per hour")(self._get_parsing_endpoints)
-        self.limiter.limit("10 per hour")(self._get_batch_endpoints)
-        
-        # Search and export - more generous limits
-        self.limiter.limit("100 per hour")(self._get_search_endpoints)
-        self.limiter.limit("50 per hour")(self._get_export_endpoints)
-        
-        # Administrative endpoints - very strict
-        self.limiter.limit("5 per minute")(self._get_admin_endpoints)
+        """Configure specific rate limits for different endpoints
+
+        Groups name blueprint endpoints ("auth.login", "documents.parse", ...)
+        that this app does not register, so only the default limits apply and
+        no per-request hook is installed. Pointing a group at real endpoints is
+        a rate limit policy change and needs its own review.
+        """
+        self._endpoint_groups = [
+            # Authentication endpoints - stricter limits
+            ("auth", "10 per minute", self._get_auth_endpoints()),
+            ("registration", "5 per hour", self._get_registration_endpoints()),
+            
+            # Document processing - moderate limits
+            ("parsing", "30 per hour", self._get_parsing_endpoints()),
+            ("batch", "10 per hour", self._get_batch_endpoints()),
+            
+            # Search and export - more generous limits
+            ("search", "100 per hour", self._get_search_endpoints()),
+            ("export", "50 per hour", self._get_export_endpoints()),
+            
+            # Administrative endpoints - very strict
+            ("admin", "5 per minute", self._get_admin_endpoints()),
+        ]
 
     def _get_auth_endpoints(self):
         """Identify authentication endpoints"""
@@ -88,22 +120,19 @@ class RateLimitManager:
             "success": False,
             "error": "rate_limit_exceeded",
             "message": f"Rate limit exceeded. {request_limit.limit}",
-            "retry_after": request_limit.reset_at.isoformat() if hasattr(request_limit, 'reset_at') else None
+            "retry_after": _reset_iso(request_limit.reset_at) if getattr(request_limit, 'reset_at', None) else None
         }), 429
 
     def get_rate_limit_headers(self, response):
         """Add rate limit headers to responses"""
-        if not hasattr(self.limiter, "limiter"):
+        limit = self.limiter.current_limit
+        if limit is None:
             return response
         
-        limit = getattr(request, "rate_limit", None)
-        if limit and limit.valid:
-            response.headers.extend({
-                "X-RateLimit-Limit": limit.limit,
-                "X-RateLimit-Remaining": limit.remaining,
-                "X-RateLimit-Reset": limit.reset_at.isoformat() if hasattr(limit, 'reset_at') else None
-            })
-        
+        headers = response.headers
+        headers["X-RateLimit-Limit"] = str(limit.limit)
+        headers["X-RateLimit-Remaining"] = str(limit.remaining)
+        headers["X-RateLimit-Reset"] = _reset_iso(limit.reset_at)
         return response
 
     def user_specific_limit(self, user_tier: str = "free"):
@@ -139,7 +168,7 @@ class RateLimitManager:
                     "document_parsing": "30 per hour",
                     "batch_processing": "10 per hour"
                 },
-                "storage_backend": "memory"
+                "storage_backend": self.storage_uri.split("://", 1)[0]
             }
         except Exception as e:
             self.logger.error(f"Error getting rate limit info: {e}")
@@ -1,17 +1,277 @@
 import os
 import re
+import json
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from bson import ObjectId
-from pymongo import MongoClient, TEXT, DESCENDING
+from pymongo import MongoClient, IndexModel, TEXT, ASCENDING, DESCENDING
 import logging
 
+# Characters of text_preview returned with each search result
+SEARCH_PREVIEW_LENGTH = 200
+
+# Whitespace-only search text is no text filter at all (single characters such
+# as digits are indexed terms and still searched); longer queries are refused
+_TEXT_OK = re.compile(r"\S").search
+MAX_SEARCH_TEXT_LENGTH = 256
+
+def _non_empty(value):
+    """Aggregation truthiness matching Python's for extracted values"""
+    return {"$and": [
+        value,
+        {"$ne": [value, ""]},
+        {"$not": [{"$and": [{"$isArray": value}, {"$eq": [{"$size": value}, 0]}]}]},
+    ]}
+
+# Server-side search result extraction summary; parts with nothing extracted
+# are left out, as if the keys were never set
+EXTRACTION_SUMMARY = {
+    "$let": {
+        "vars": {
+            "patterns": {"$objectToArray": {"$ifNull": ["$extraction_data.patterns", {}]}},
+            "contacts": {"$objectToArray": {"$ifNull": ["$extraction_data.contacts", {}]}},
+            "entities": {"$objectToArray": {"$ifNull": ["$extraction_data.entities", {}]}},
+        },
+        "in": {
+            "key_patterns": {"$cond": [{"$gt": [{"$size": "$$patterns"}, 0]},
+                                       {"$slice": ["$$patterns.k", 3]}, "$$REMOVE"]},
+            "pattern_count": {"$cond": [{"$gt": [{"$size": "$$patterns"}, 0]},
+                                        {"$size": "$$patterns"}, "$$REMOVE"]},
+            "contact_count": {"$cond": [{"$gt": [{"$size": "$$contacts"}, 0]},
+                                        {"$size": "$$contacts"}, "$$REMOVE"]},
+            "total_contacts": {"$cond": [
+                {"$gt": [{"$size": "$$contacts"}, 0]},
+                {"$reduce": {
+                    "input": "$$contacts",
+                    "initialValue": 0,
+                    "in": {"$add": ["$$value", {"$cond": [
+                        _non_empty("$$this.v"),
+                        {"$cond": [{"$isArray": "$$this.v"}, {"$size": "$$this.v"}, 1]},
+                        0,
+                    ]}]},
+                }},
+                "$$REMOVE",
+            ]},
+            "entities": {"$cond": [
+                {"$gt": [{"$size": "$$entities"}, 0]},
+                {"$arrayToObject": {"$map": {
+                    "input": {"$filter": {
+                        "input": "$$entities",
+                        "cond": {"$and": [{"$isArray": "$$this.v"},
+                                          {"$gt": [{"$size": "$$this.v"}, 0]}]},
+                    }},
+                    "in": {"k": "$$this.k", "v": {"$size": "$$this.v"}},
+                }}},
+                "$$REMOVE",
+            ]},
+        },
+    }
+}
+
+# Search pipeline stages that never change between requests, built once.
+# The results projection is applied only to the page that survives
+# $skip/$limit; just the fields the result formatter reads are sent back, and
+# the preview (ellipsis included), preview flag and extraction summary are all
+# computed server-side
+_RESULTS_PROJECTION = MappingProxyType({
+    "_id": 1,
+    "document_id": 1,
+    "filename": 1,
+    "document_type": 1,
+    "file_type": 1,
+    "file_size": 1,
+    "created_at": 1,
+    "processing_time": 1,
+    "text_preview": {"$let": {
+        "vars": {"preview": {"$ifNull": ["$text_preview", ""]}},
+        "in": {"$cond": [
+            {"$gt": [{"$strLenCP": "$$preview"}, SEARCH_PREVIEW_LENGTH]},
+            {"$concat": [{"$substrCP": ["$$preview", 0, SEARCH_PREVIEW_LENGTH]}, "..."]},
+            "$$preview"
+        ]}
+    }},
+    "extraction_summary": EXTRACTION_SUMMARY,
+    "has_preview": {"$eq": ["$preview_data.preview_generated", True]}
+})
+_PROJECT_RESULTS = MappingProxyType({"$project": _RESULTS_PROJECTION})
+_PROJECT_SCORED_RESULTS = MappingProxyType({"$project": {**_RESULTS_PROJECTION, "search_score": 1}})
+_ADD_SEARCH_SCORE = MappingProxyType({"$addFields": {"search_score": {"$meta": "textScore"}}})
+_SORT_RECENT = MappingProxyType({"$sort": {"created_at": DESCENDING}})
+_SORT_RECENT_KEYSET = MappingProxyType({"$sort": {"created_at": DESCENDING, "_id": DESCENDING}})
+_SORT_RELEVANCE = MappingProxyType({"$sort": {"search_score": DESCENDING, "created_at": DESCENDING}})
+
+# In-process result caches: identical searches within the TTL reuse the last response
+SEARCH_CACHE_SIZE = 4096
+SEARCH_CACHE_TTL = 30
+FACETS_CACHE_TTL = 300
+# Pre-aggregated user_facets are recomputed from parsed_documents once this old,
+# which also repairs drift from writers that bypass document_added/removed
+FACETS_REBUILD_TTL = 3600
+# Autocomplete resends the same prefix many times within a second or two
+QUICK_SEARCH_CACHE_TTL = 5
+
+
+class _TTLCache:
+    """Thread-safe LRU whose entries expire ttl seconds after they were stored"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id: str):
+        """Drop every entry whose key starts with user_id"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+@lru_cache(maxsize=1024)
+def _parse_iso(value: str) -> datetime:
+    """Parse an ISO 8601 date filter; clients resend the same few dates while paging"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _page_bounds(query: Dict[str, Any]) -> Tuple[int, int]:
+    """Validated (page, per_page) with per_page clamped to 1..100"""
+    try:
+        page = max(1, int(query.get('page', 1)))
+    except (TypeError, ValueError):
+        page = 1
+    try:
+        per_page = min(100, max(1, int(query.get('per_page', 20))))
+    except (TypeError, ValueError):
+        per_page = 20
+    return page, per_page
+
+def _encode_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just past doc in (created_at, _id) order"""
+    payload = {"created_at": doc["created_at"].isoformat(), "_id": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    """(created_at, _id) from a cursor made by _encode_cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(payload["created_at"]), ObjectId(payload["_id"])
+    except Exception as e:
+        raise ValueError(f"Invalid after_cursor: {e}")
+
+# Key patterns of the compound indexes searches hint at; hints name the keys
+# rather than the index, so an equivalent index under another name still serves
+USER_RECENCY_KEYS = (("user_id", 1), ("created_at", -1))
+USER_RECENCY_CURSOR_KEYS = (("user_id", 1), ("created_at", -1), ("_id", -1))
+USER_TYPE_RECENCY_KEYS = (("user_id", 1), ("document_type", 1), ("created_at", -1))
+USER_FILE_RECENCY_KEYS = (("user_id", 1), ("file_type", 1), ("created_at", -1))
+
+def _key_pattern(index_key) -> Tuple:
+    """Hashable (field, direction) pairs of a list_indexes key document"""
+    return tuple((field, int(direction)) if isinstance(direction, (int, float)) else (field, direction)
+                 for field, direction in index_key.items())
+
 class DocumentSearchEngine:
+    # Databases whose search indexes were already set up by this process
+    _indexes_ready = set()
+    # Index key patterns confirmed to exist, per database; only these are hinted
+    _index_keys = {}
+
     def __init__(self, db_connection):
         self.db = db_connection
         self.logger = self._setup_logger()
+        self._search_cache = _TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+        # Totals per filter set, shared by every page of the same search
+        self._count_cache = _TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+        self._facets_cache = _TTLCache(SEARCH_CACHE_SIZE, FACETS_CACHE_TTL)
+        self._quick_cache = _TTLCache(SEARCH_CACHE_SIZE, QUICK_SEARCH_CACHE_TTL)
+        # Pass a database from the process's shared MongoClient; result pages
+        # are large and repetitive, so that client should compress the wire
+        try:
+            compression = self.db.client.options.pool_options._compression_settings
+            if compression is not None and not compression.compressors:
+                self.logger.warning("MongoDB wire compression is off; set compressors on the shared MongoClient")
+        except AttributeError:
+            pass
         self.setup_search_indexes()
 
+    def invalidate(self, user_id: str):
+        """Forget cached searches and facets after the user's documents change"""
+        self._search_cache.discard_user(user_id)
+        self._facets_cache.discard_user(user_id)
+        self._quick_cache.discard_user(user_id)
+        self._count_cache.discard_user(user_id)
+
+    def document_added(self, user_id: str, document: Dict[str, Any]):
+        """Count a newly stored document in the user's facets and drop stale caches"""
+        self._update_facets(user_id, document, 1)
+        self.invalidate(user_id)
+
+    def document_removed(self, user_id: str, document: Dict[str, Any]):
+        """Uncount a deleted document from the user's facets and drop stale caches"""
+        self._update_facets(user_id, document, -1)
+        self.invalidate(user_id)
+
+    def _update_facets(self, user_id: str, document: Dict[str, Any], delta: int):
+        """Apply one insert (+1) or delete (-1) to the user's pre-aggregated facets"""
+        inc = {"total": delta}
+        for field, facet in (("document_type", "document_types"), ("file_type", "file_types")):
+            value = document.get(field)
+            # Values that cannot be field names are left to the next re-aggregation
+            if value and isinstance(value, str) and "." not in value and not value.startswith("$"):
+                inc[f"{facet}.{value}"] = delta
+        update = {"$inc": inc}
+        created_at = document.get("created_at")
+        if delta > 0 and created_at:
+            update["$min"] = {"min_date": created_at}
+            update["$max"] = {"max_date": created_at}
+        try:
+            # No upsert: users without a facets document are seeded from a full
+            # aggregation on their next get_search_facets call
+            result = self.db.user_facets.update_one({"user_id": user_id}, update)
+            if delta < 0 and result.matched_count:
+                # A bound may have just been deleted; both are one index lookup away
+                newest = self.db.parsed_documents.find_one(
+                    {"user_id": user_id}, {"created_at": 1}, sort=[("created_at", DESCENDING)])
+                oldest = self.db.parsed_documents.find_one(
+                    {"user_id": user_id}, {"created_at": 1}, sort=[("created_at", ASCENDING)])
+                self.db.user_facets.update_one({"user_id": user_id}, {"$set": {
+                    "min_date": oldest.get("created_at") if oldest else None,
+                    "max_date": newest.get("created_at") if newest else None
+                }})
+        except Exception as e:
+            # Drop the summary so it is rebuilt rather than left miscounted
+            self.logger.warning(f"Facet update failed for user {user_id}: {e}")
+            try:
+                self.db.user_facets.delete_one({"user_id": user_id})
+            except Exception:
+                pass
+
     def _setup_logger(self):
         """Setup logger for search engine"""
         logger = logging.getLogger(__name__)
@@ -23,93 +283,133 @@ class DocumentSearchEngine:
             logger.setLevel(logging.INFO)
         return logger
 
-    def setup_search_indexes(self):
-        """Create search indexes for optimal performance - FIXED VERSION"""
+    def setup_search_indexes(self, force: bool = False):
+        """Create search indexes for optimal performance, once per database per process"""
+        db_name = getattr(self.db, "name", None)
+        if not force and db_name in DocumentSearchEngine._indexes_ready:
+            return
+        
         try:
-            # First, check and drop conflicting indexes
-            existing_indexes = list(self.db.parsed_documents.list_indexes())
-            
-            for index in existing_indexes:
-                index_name = index.get('name', '')
-                index_key = index.get('key', {})
-                
-                # Check for conflicting compound indexes
-                if (index_key.get('user_id') == 1 and index_key.get('created_at') == -1 and 
-                    index_name != "user_recency_index"):
-                    self.logger.info(f"Dropping conflicting index: {index_name}")
-                    self.db.parsed_documents.drop_index(index_name)
-                
-                # Check for other text indexes that might conflict
-                elif ('text' in index_name and index_name != "text_search_index" and 
-                      any(field in index_key for field in ['filename', 'full_text', 'document_type'])):
-                    self.logger.info(f"Dropping old text index: {index_name}")
-                    self.db.parsed_documents.drop_index(index_name)
-
-            # Create text search index with explicit name
-            try:
-                self.db.parsed_documents.create_index([
+            desired = [
+                IndexModel([
                     ("filename", TEXT),
                     ("full_text", TEXT),
                     ("document_type", TEXT)
-                ], name="text_search_index", default_language="english")
-                self.logger.info("Text search index created successfully")
-            except Exception as e:
-                if "index with different options already exists" not in str(e):
-                    self.logger.warning(f"Text index creation: {e}")
-
-            # Compound indexes for common queries with explicit names
-            indexes_to_create = [
-                {
-                    "keys": [("user_id", 1), ("created_at", -1)],
-                    "name": "user_recency_index"
-                },
-                {
-                    "keys": [("user_id", 1), ("document_type", 1), ("created_at", -1)],
-                    "name": "user_type_recency_index"
-                }
+                ], name="text_search_index", default_language="english"),
+                # Compound indexes for common queries with explicit names
+                IndexModel(list(USER_RECENCY_KEYS), name="user_recency_index"),
+                IndexModel(list(USER_RECENCY_CURSOR_KEYS), name="user_recency_cursor_index"),
+                IndexModel(list(USER_TYPE_RECENCY_KEYS), name="user_type_recency_index"),
+                IndexModel(list(USER_FILE_RECENCY_KEYS), name="user_file_recency_index")
             ]
             
-            for index_config in indexes_to_create:
+            # One listIndexes read; conflicts are worked out in memory
+            existing = {index["name"]: index for index in self.db.parsed_documents.list_indexes()}
+            to_drop = [name for name, index in existing.items() if self._index_conflicts(name, index)]
+            to_create = [model for model in desired
+                         if model.document["name"] not in existing or model.document["name"] in to_drop]
+            
+            # One dropIndexes and one createIndexes command, instead of a round
+            # trip per index
+            if to_drop:
+                self.logger.info(f"Dropping conflicting indexes: {', '.join(to_drop)}")
+                self.db.command("dropIndexes", "parsed_documents", index=to_drop)
+            if to_create:
                 try:
-                    self.db.parsed_documents.create_index(
-                        index_config["keys"],
-                        name=index_config["name"]
-                    )
-                    self.logger.info(f"Index {index_config['name']} created successfully")
-                except Exception as e:
-                    if "already exists" not in str(e):
-                        self.logger.warning(f"Index {index_config['name']} creation: {e}")
+                    self.db.parsed_documents.create_indexes(to_create)
+                    self.logger.info("Search indexes created successfully")
+                except Exception:
+                    # Fall back to one call per index so a single conflict
+                    # does not block the rest
+                    for model in to_create:
+                        try:
+                            self.db.parsed_documents.create_indexes([model])
+                        except Exception as e:
+                            self.logger.warning(f"Index {model.document['name']} creation: {e}")
             
+            # A failed creation (e.g. the same keys under another name) must
+            # not leave searches hinting at an index that is not there
+            DocumentSearchEngine._index_keys[db_name] = {
+                _key_pattern(index.get('key', {})) for index in self.db.parsed_documents.list_indexes()
+            }
+            
+            # One pre-aggregated facets document per user
+            try:
+                self.db.user_facets.create_index("user_id", unique=True, name="user_facets_user_index")
+            except Exception as e:
+                if "already exists" not in str(e):
+                    self.logger.warning(f"Index user_facets_user_index creation: {e}")
+            
+            DocumentSearchEngine._indexes_ready.add(db_name)
             self.logger.info("Search indexes setup completed")
             
         except Exception as e:
             self.logger.error(f"Error setting up search indexes: {e}")
 
+    @staticmethod
+    def _index_conflicts(index_name: str, index: Dict[str, Any]) -> bool:
+        """Whether an existing parsed_documents index must go before the desired set is created"""
+        index_key = index.get('key', {})
+        
+        # Same keys as user_recency_index under another name (the wider
+        # compound indexes also contain these keys and must be kept)
+        if _key_pattern(index_key) == USER_RECENCY_KEYS:
+            return index_name != "user_recency_index"
+        
+        # Other text indexes; a collection may only have one
+        if index_name == "text_search_index":
+            return False
+        # (list_indexes reports text index keys as _fts/_ftsx)
+        return ('_fts' in index_key or
+                ('text' in index_name and
+                 any(field in index_key for field in ['filename', 'full_text', 'document_type'])))
+
     def search_documents(self, user_id: str, query: Dict[str, Any]) -> Dict[str, Any]:
         """
         Advanced document search with multiple filters - FIXED VERSION
         """
         try:
-            # Build filter pipeline
-            pipeline = self._build_search_pipeline(user_id, query)
+            cache_key = (user_id, json.dumps(query, sort_keys=True, default=str))
+            cached = self._search_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            # Execute search
-            results = list(self.db.parsed_documents.aggregate(pipeline))
+            # Keyset pages are opted into by sending after_cursor (empty for the
+            # first page) or pagination="cursor"; relevance-ranked text
+            # searches always page by offset
+            if query.get('pagination') == 'cursor' or 'after_cursor' in query:
+                match_stage = self._build_match_stage(user_id, query)
+                if "$text" not in match_stage:
+                    response = self._keyset_search(match_stage, query)
+                    self._search_cache.set(cache_key, response)
+                    return response
             
-            # Get total count for pagination
-            count_pipeline = self._build_count_pipeline(user_id, query)
-            total_count = list(self.db.parsed_documents.aggregate(count_pipeline))
-            total = total_count[0]['total'] if total_count else 0
+            # The page is a top-k sort ($sort + $skip + $limit); the total is a
+            # separate count, cached across pages of the same search
+            pipeline = self._build_search_pipeline(user_id, query)
+            match_stage = pipeline[0]["$match"]
+            # Index-served recency pages never spill, so disk use stays off to
+            # surface plan regressions; relevance sorts keep the server default
+            options = {}
+            hint = self._index_hint(match_stage)
+            if hint:
+                options["hint"] = hint
+                options["allowDiskUse"] = False
+            results = list(self.db.parsed_documents.aggregate(pipeline, **options))
+            total = self._count_matches(user_id, match_stage)
             
             # Format results
             formatted_results = self._format_search_results(results)
             
-            return {
+            response = {
                 "success": True,
                 "results": formatted_results,
                 "total_count": total,
                 "filters_applied": query
             }
+            # Errors are not cached so a transient failure is retried on the next call
+            self._search_cache.set(cache_key, response)
+            return response
             
         except Exception as e:
             self.logger.error(f"Search error: {e}")
@@ -120,14 +420,59 @@ class DocumentSearchEngine:
                 "total_count": 0
             }
 
-    def _build_search_pipeline(self, user_id: str, query: Dict[str, Any]) -> List[Dict]:
-        """Build MongoDB aggregation pipeline for search - FIXED VERSION"""
-        pipeline = []
+    def _keyset_search(self, match_stage: Dict[str, Any], query: Dict[str, Any]) -> Dict[str, Any]:
+        """Recency-ordered page after query["after_cursor"], read in O(per_page)"""
+        _, per_page = _page_bounds(query)
+        page_match = match_stage
+        if query.get('after_cursor'):
+            created_at, last_id = _decode_cursor(query['after_cursor'])
+            page_match = {**match_stage, "$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": last_id}}
+            ]}
+        
+        options = {"allowDiskUse": False}
+        hint = None if {"document_type", "file_type"} & match_stage.keys() else self._hint(USER_RECENCY_CURSOR_KEYS)
+        if hint:
+            options["hint"] = hint
+        results = list(self.db.parsed_documents.aggregate([
+            {"$match": page_match},
+            _SORT_RECENT_KEYSET,
+            {"$limit": per_page},
+            _PROJECT_RESULTS
+        ], **options))
+        
+        # A short page is the last one
+        next_cursor = None
+        if len(results) == per_page and results[-1].get("created_at"):
+            next_cursor = _encode_cursor(results[-1])
+        
+        return {
+            "success": True,
+            "results": self._format_search_results(results),
+            "total_count": self._count_matches(match_stage["user_id"], match_stage),
+            "next_cursor": next_cursor,
+            "filters_applied": query
+        }
+
+    def _count_matches(self, user_id: str, match_stage: Dict[str, Any]) -> int:
+        """Number of the user's documents matching a search filter"""
+        cache_key = (user_id, json.dumps(match_stage, sort_keys=True, default=str))
+        total = self._count_cache.get(cache_key)
+        if total is None:
+            total = self.db.parsed_documents.count_documents(match_stage)
+            self._count_cache.set(cache_key, total)
+        return total
+
+    def _build_match_stage(self, user_id: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the $match filter shared by the result page and the total count"""
         match_stage = {"user_id": user_id}
         
         # Text search
         search_text = query.get('search_text')
-        if search_text and search_text.strip():
+        if search_text and _TEXT_OK(search_text):
+            if len(search_text) > MAX_SEARCH_TEXT_LENGTH:
+                raise ValueError(f"search_text exceeds {MAX_SEARCH_TEXT_LENGTH} characters")
             match_stage["$text"] = {"$search": search_text}
 
         # Document type filter
@@ -139,15 +484,13 @@ class DocumentSearchEngine:
         date_filters = {}
         if query.get('date_from'):
             try:
-                date_from = query['date_from'].replace('Z', '+00:00')
-                date_filters["$gte"] = datetime.fromisoformat(date_from)
+                date_filters["$gte"] = _parse_iso(query['date_from'])
             except Exception as e:
                 self.logger.warning(f"Invalid date_from: {query['date_from']} - {e}")
         
         if query.get('date_to'):
             try:
-                date_to = query['date_to'].replace('Z', '+00:00')
-                date_filters["$lte"] = datetime.fromisoformat(date_to)
+                date_filters["$lte"] = _parse_iso(query['date_to'])
             except Exception as e:
                 self.logger.warning(f"Invalid date_to: {query['date_to']} - {e}")
         
@@ -159,120 +502,85 @@ class DocumentSearchEngine:
         if file_types:
             match_stage["file_type"] = {"$in": file_types}
 
-        # Add match stage to pipeline
-        if match_stage:
-            pipeline.append({"$match": match_stage})
-
-        # Pagination
-        page = max(1, query.get('page', 1))
-        per_page = min(100, max(1, query.get('per_page', 20)))
-        skip = (page - 1) * per_page
+        return match_stage
 
-        # Add sorting and pagination
-        sort_stage = {"$sort": {"created_at": DESCENDING}}
-        
-        # If text search, sort by score first, then date
-        if search_text and search_text.strip():
-            sort_stage["$sort"] = {"search_score": {"$meta": "textScore"}, "created_at": DESCENDING}
-        
-        pipeline.extend([
-            sort_stage,
-            {"$skip": skip},
-            {"$limit": per_page}
-        ])
-
-        # Projection stage
-        project_stage = {
-            "$project": {
-                "_id": 1,
-                "document_id": 1,
-                "filename": 1,
-                "document_type": 1,
-                "file_type": 1,
-                "file_size": 1,
-                "created_at": 1,
-                "processing_time": 1,
-                "text_preview": 1,
-                "extraction_data": 1,
-                "preview_data": 1
-            }
-        }
-        
-        # Add search score if text search was performed
-        if search_text and search_text.strip():
-            project_stage["$project"]["search_score"] = {"$meta": "textScore"}
-        
-        pipeline.append(project_stage)
+    def _hint(self, keys: Tuple) -> Optional[List[Tuple[str, int]]]:
+        """Hint for an index key pattern, if setup_search_indexes confirmed it exists"""
+        # Hinting an index that is not there fails the query outright
+        if keys in DocumentSearchEngine._index_keys.get(getattr(self.db, "name", None), ()):
+            return list(keys)
+        return None
 
-        return pipeline
+    def _index_hint(self, match_stage: Dict[str, Any]) -> Optional[List[Tuple[str, int]]]:
+        """Compound index that serves this $match and the created_at sort, if one applies"""
+        # $text queries must use the text index
+        if "$text" in match_stage:
+            return None
+        if "document_type" in match_stage:
+            return self._hint(USER_TYPE_RECENCY_KEYS)
+        if "file_type" in match_stage:
+            return self._hint(USER_FILE_RECENCY_KEYS)
+        return self._hint(USER_RECENCY_KEYS)
 
-    def _build_count_pipeline(self, user_id: str, query: Dict[str, Any]) -> List[Dict]:
-        """Build pipeline to get total count"""
-        pipeline = []
-        match_stage = {"user_id": user_id}
-        
-        # Text search
-        search_text = query.get('search_text')
-        if search_text and search_text.strip():
-            match_stage["$text"] = {"$search": search_text}
+    def _build_search_pipeline(self, user_id: str, query: Dict[str, Any]) -> List[Dict]:
+        """Build the aggregation returning one page of formatted-ready results"""
+        match_stage = self._build_match_stage(user_id, query)
+        text_search = "$text" in match_stage
+        # $match always leads (it holds at least user_id): the planner only uses
+        # an index for it, and for $text, as the first stage. New filters go into
+        # _build_match_stage, never into extra stages ahead of this one
+        pipeline = [{"$match": match_stage}]
 
-        # Document type filter
-        document_types = query.get('document_types')
-        if document_types and document_types != ['all']:
-            match_stage["document_type"] = {"$in": document_types}
+        # Pagination
+        page, per_page = _page_bounds(query)
+        skip = (page - 1) * per_page
 
-        # Date range filter
-        date_filters = {}
-        if query.get('date_from'):
-            try:
-                date_from = query['date_from'].replace('Z', '+00:00')
-                date_filters["$gte"] = datetime.fromisoformat(date_from)
-            except:
-                pass
-        
-        if query.get('date_to'):
-            try:
-                date_to = query['date_to'].replace('Z', '+00:00')
-                date_filters["$lte"] = datetime.fromisoformat(date_to)
-            except:
-                pass
+        # If text search, sort by score first, then date. The $sort is directly
+        # followed by $skip/$limit so the server keeps only the top
+        # skip + per_page documents instead of sorting the whole match
+        if text_search:
+            pipeline.append(_ADD_SEARCH_SCORE)
+            pipeline.append(_SORT_RELEVANCE)
+            project_stage = _PROJECT_SCORED_RESULTS
+        else:
+            pipeline.append(_SORT_RECENT)
+            project_stage = _PROJECT_RESULTS
         
-        if date_filters:
-            match_stage["created_at"] = date_filters
-
-        # File type filter
-        file_types = query.get('file_types')
-        if file_types:
-            match_stage["file_type"] = {"$in": file_types}
+        pipeline.append({"$skip": skip})
+        pipeline.append({"$limit": per_page})
+        pipeline.append(project_stage)
 
-        # Add match stage and count
-        pipeline.append({"$match": match_stage})
-        pipeline.append({"$count": "total"})
-        
+        # Checked explicitly rather than with assert, which python -O strips
+        if "$match" not in pipeline[0]:
+            raise RuntimeError("pipeline first stage must be $match for index usage")
         return pipeline
 
     def _format_search_results(self, results: List[Dict]) -> List[Dict]:
         """Format search results for API response"""
         formatted = []
+        append = formatted.append
         for doc in results:
+            get = doc.get
+            created_at = get("created_at")
             formatted_doc = {
                 "id": str(doc["_id"]),
-                "document_id": doc.get("document_id", ""),
-                "filename": doc.get("filename", ""),
-                "document_type": doc.get("document_type", "unknown"),
-                "file_type": doc.get("file_type", ""),
-                "file_size": doc.get("file_size", 0),
-                "created_at": doc.get("created_at").isoformat() if doc.get("created_at") else None,
-                "processing_time": doc.get("processing_time", ""),
-                "text_preview": self._truncate_text(doc.get("text_preview", ""), 200),
-                "extraction_summary": self._create_extraction_summary(doc.get("extraction_data", {})),
-                "has_preview": bool(doc.get("preview_data", {}).get("preview_generated", False))
+                "document_id": get("document_id", ""),
+                "filename": get("filename", ""),
+                "document_type": get("document_type", "unknown"),
+                "file_type": get("file_type", ""),
+                "file_size": get("file_size", 0),
+                "created_at": created_at.isoformat() if created_at else None,
+                "processing_time": get("processing_time", ""),
+                "text_preview": get("text_preview") or "",
+                "extraction_summary": get("extraction_summary") or {},
+                "has_preview": get("has_preview", False)
             }
             
-            if doc.get('search_score'):
-                formatted_doc['relevance_score'] = round(doc['search_score'], 3)
+            search_score = get('search_score')
+            if search_score:
+                formatted_doc['relevance_score'] = round(search_score, 3)
                 
-            formatted.append(formatted_doc)
+            append(formatted_doc)
         
         return formatted
 
@@ -284,74 +592,34 @@ class DocumentSearchEngine:
             return text
         return text[:max_length] + "..."
 
-    def _create_extraction_summary(self, extraction_data: Dict) -> Dict:
-        """Create a summary of extracted data for search results"""
-        summary = {}
-        
-        if extraction_data.get('patterns'):
-            patterns = extraction_data['patterns']
-            summary['key_patterns'] = list(patterns.keys())[:3]
-            summary['pattern_count'] = len(patterns)
-        
-        if extraction_data.get('contacts'):
-            contacts = extraction_data['contacts']
-            summary['contact_count'] = len(contacts)
-            # Count actual contact values
-            total_contacts = sum(len(v) if isinstance(v, list) else 1 for v in contacts.values() if v)
-            summary['total_contacts'] = total_contacts
-            
-        if extraction_data.get('entities'):
-            entities = extraction_data['entities']
-            entity_counts = {k: len(v) for k, v in entities.items() if v}
-            summary['entities'] = entity_counts
-            
-        return summary
-
     def get_search_facets(self, user_id: str) -> Dict[str, Any]:
         """Get available search facets and counts"""
         try:
-            pipeline = [
-                {"$match": {"user_id": user_id}},
-                {"$facet": {
-                    "document_types": [
-                        {"$group": {"_id": "$document_type", "count": {"$sum": 1}}}
-                    ],
-                    "file_types": [
-                        {"$group": {"_id": "$file_type", "count": {"$sum": 1}}}
-                    ],
-                    "date_range": [
-                        {"$group": {
-                            "_id": None,
-                            "min_date": {"$min": "$created_at"},
-                            "max_date": {"$max": "$created_at"}
-                        }}
-                    ],
-                    "total_count": [
-                        {"$count": "count"}
-                    ]
-                }}
-            ]
+            cache_key = (user_id,)
+            cached = self._facets_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            result = list(self.db.parsed_documents.aggregate(pipeline))
-            if not result:
-                return {
-                    "document_types": {},
-                    "file_types": {},
-                    "date_range": {"min_date": None, "max_date": None},
-                    "total_documents": 0
-                }
-                
-            result = result[0]
+            # Kept current by document_added/document_removed, and rebuilt when
+            # missing, older than FACETS_REBUILD_TTL or out of step with the
+            # user's document count (e.g. after writes that skipped the hooks)
+            summary = self.db.user_facets.find_one({"user_id": user_id})
+            if summary is None or self._facets_stale(user_id, summary):
+                summary = self._rebuild_facets(user_id)
             
-            return {
-                "document_types": {item["_id"]: item["count"] for item in result["document_types"] if item["_id"]},
-                "file_types": {item["_id"]: item["count"] for item in result["file_types"] if item["_id"]},
+            min_date = summary.get("min_date")
+            max_date = summary.get("max_date")
+            facets = {
+                "document_types": {k: n for k, n in summary.get("document_types", {}).items() if n > 0},
+                "file_types": {k: n for k, n in summary.get("file_types", {}).items() if n > 0},
                 "date_range": {
-                    "min_date": result["date_range"][0]["min_date"].isoformat() if result["date_range"] and result["date_range"][0]["min_date"] else None,
-                    "max_date": result["date_range"][0]["max_date"].isoformat() if result["date_range"] and result["date_range"][0]["max_date"] else None
+                    "min_date": min_date.isoformat() if min_date else None,
+                    "max_date": max_date.isoformat() if max_date else None
                 },
-                "total_documents": result["total_count"][0]["count"] if result["total_count"] else 0
+                "total_documents": max(summary.get("total", 0), 0)
             }
+            self._facets_cache.set(cache_key, facets)
+            return facets
             
         except Exception as e:
             self.logger.error(f"Error getting search facets: {e}")
@@ -362,38 +630,100 @@ class DocumentSearchEngine:
                 "total_documents": 0
             }
 
+    def _facets_stale(self, user_id: str, summary: Dict[str, Any]) -> bool:
+        """Whether a stored facets summary must be recomputed"""
+        computed_at = summary.get("computed_at")
+        if computed_at is None or datetime.utcnow() - computed_at > timedelta(seconds=FACETS_REBUILD_TTL):
+            return True
+        return summary.get("total", 0) != self.db.parsed_documents.count_documents({"user_id": user_id})
+
+    def _rebuild_facets(self, user_id: str) -> Dict[str, Any]:
+        """Recompute and store a user's facets summary in one upsert"""
+        summary = self._aggregate_facets(user_id)
+        summary["user_id"] = user_id
+        summary["computed_at"] = datetime.utcnow()
+        try:
+            # Whole-document replace, so a concurrent rebuild or a summary seeded
+            # by a racing request is simply overwritten with fresh counts
+            self.db.user_facets.replace_one({"user_id": user_id}, summary, upsert=True)
+        except Exception as e:
+            self.logger.warning(f"Storing facets for user {user_id} failed: {e}")
+        return summary
+
+    def _aggregate_facets(self, user_id: str) -> Dict[str, Any]:
+        """Full facets summary for one user, used to (re)build user_facets"""
+        match = {"$match": {"user_id": user_id}}
+        pipelines = [
+            [match, {"$group": {"_id": "$document_type", "count": {"$sum": 1}}}],
+            [match, {"$group": {"_id": "$file_type", "count": {"$sum": 1}}}],
+            [match, {"$group": {
+                "_id": None,
+                "min_date": {"$min": "$created_at"},
+                "max_date": {"$max": "$created_at"}
+            }}]
+        ]
+        options = {}
+        hint = self._hint(USER_RECENCY_KEYS)
+        if hint:
+            options["hint"] = hint
+        
+        # Independent groups rather than one $facet, so the server scans them
+        # concurrently and no single result document approaches 16 MB
+        with ThreadPoolExecutor(max_workers=len(pipelines)) as executor:
+            document_types, file_types, date_range = executor.map(
+                lambda pipeline: list(self.db.parsed_documents.aggregate(pipeline, **options)),
+                pipelines
+            )
+        
+        date_range = date_range[0] if date_range else {}
+        return {
+            "document_types": {item["_id"]: item["count"] for item in document_types if item["_id"]},
+            "file_types": {item["_id"]: item["count"] for item in file_types if item["_id"]},
+            "min_date": date_range.get("min_date"),
+            "max_date": date_range.get("max_date"),
+            # Every document falls in exactly one document_type group
+            "total": sum(item["count"] for item in document_types)
+        }
+
     def quick_search(self, user_id: str, search_text: str, limit: int = 10) -> Dict[str, Any]:
         """Quick search for autocomplete and quick results"""
         try:
-            pipeline = [
-                {
-                    "$match": {
-                        "$text": {"$search": search_text},
-                        "user_id": user_id
-                    }
-                },
-                {"$sort": {"search_score": {"$meta": "textScore"}}},
-                {"$limit": limit},
-                {"$project": {
-                    "_id": 1,
-                    "filename": 1,
-                    "document_type": 1,
-                    "text_preview": 1,
-                    "search_score": {"$meta": "textScore"}
-                }}
-            ]
-            
-            results = list(self.db.parsed_documents.aggregate(pipeline))
-            formatted_results = [
-                {
-                    "id": str(doc["_id"]),
-                    "filename": doc.get("filename"),
-                    "document_type": doc.get("document_type"),
-                    "text_snippet": self._truncate_text(doc.get("text_preview", ""), 100),
-                    "score": round(doc.get("search_score", 0), 3)
+            # Nothing to match yet (empty or whitespace-only autocomplete input)
+            if not search_text or not _TEXT_OK(search_text):
+                return {"success": True, "results": [], "query": search_text}
+            if len(search_text) > MAX_SEARCH_TEXT_LENGTH:
+                return {
+                    "success": False,
+                    "error": f"search_text exceeds {MAX_SEARCH_TEXT_LENGTH} characters",
+                    "results": []
                 }
-                for doc in results
-            ]
+            
+            # $text matching is case-insensitive, so equivalent prefixes share an entry
+            cache_key = (user_id, search_text.lower().strip(), limit)
+            formatted_results = self._quick_cache.get(cache_key)
+            if formatted_results is None:
+                # A plain find skips the aggregation framework for this
+                # single-stage query
+                cursor = self.db.parsed_documents.find(
+                    {"$text": {"$search": search_text}, "user_id": user_id},
+                    projection={
+                        "filename": 1,
+                        "document_type": 1,
+                        "text_preview": 1,
+                        "search_score": {"$meta": "textScore"}
+                    }
+                ).sort([("search_score", {"$meta": "textScore"})]).limit(limit)
+                formatted_results = [
+                    {
+                        "id": str(doc["_id"]),
+                        "filename": doc.get("filename"),
+                        "document_type": doc.get("document_type"),
+                        "text_snippet": self._truncate_text(doc.get("text_preview", ""), 100),
+                        "score": round(doc.get("search_score", 0), 3)
+                    }
+                    for doc in cursor
+                ]
+                self._quick_cache.set(cache_key, formatted_results)
             
             return {
                 "success": True,
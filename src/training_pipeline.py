@@ -1,20 +1,31 @@
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-from .document_parser import DocumentParser
+import pdfplumber
+from .document_parser import DocumentParser, _pages_text
+
+# Labeled PDFs handed to each pool worker per round trip
+LOAD_CHUNKSIZE = 16
+# Parsed PDFs buffered per Parquet record batch when streaming to disk
+PARQUET_BATCH_SIZE = 256
+
+def _extract_one(task):
+    """Worker: (text or None, document type, file path, error or None) for one labeled PDF"""
+    file_path, doc_type = task
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            return _pages_text(pdf.pages), doc_type, file_path, None
+    except Exception as e:
+        return None, doc_type, file_path, str(e)
 
 class TrainingPipeline:
     def __init__(self, data_dir: str):
         self.data_dir = data_dir
         self.parser = DocumentParser()
     
-    def load_labeled_data(self) -> pd.DataFrame:
-        """Load labeled documents from directory structure"""
-        data = {
-            'text': [],
-            'document_type': [],
-            'file_path': []
-        }
-        
+    def load_labeled_data(self, parquet_path: str = None) -> pd.DataFrame:
+        """Load labeled documents from directory structure, optionally streamed through a Parquet file"""
         # Map directory names to document types
         type_mapping = {
             'invoices': 'invoice',
@@ -23,30 +34,85 @@ class TrainingPipeline:
             'letters': 'letter'
         }
         
+        # scandir entries carry their file type, so no per-file stat is needed
+        tasks = []
         for folder, doc_type in type_mapping.items():
-            folder_path = os.path.join(self.data_dir, folder)
-            if not os.path.exists(folder_path):
+            try:
+                with os.scandir(os.path.join(self.data_dir, folder)) as entries:
+                    tasks.extend((entry.path, doc_type) for entry in entries
+                                 if entry.name.endswith('.pdf') and entry.is_file(follow_symlinks=False))
+            except FileNotFoundError:
                 continue
-                
-            for filename in os.listdir(folder_path):
-                if filename.endswith('.pdf'):
-                    file_path = os.path.join(folder_path, filename)
-                    try:
-                        text = self.parser.extract_text_from_pdf(file_path)
-                        if text and len(text) > 50:  # Minimum text length
-                            data['text'].append(text)
-                            data['document_type'].append(doc_type)
-                            data['file_path'].append(file_path)
-                    except Exception as e:
-                        print(f"Error processing {file_path}: {e}")
         
-        return pd.DataFrame(data)
+        # Each PDF parses independently, so spread them over all cores; daemonic
+        # (Celery prefork) workers cannot start children and parse in-process
+        if multiprocessing.current_process().daemon or len(tasks) <= 1:
+            results = map(_extract_one, tasks)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(tasks)))
+            results = executor.map(_extract_one, tasks, chunksize=LOAD_CHUNKSIZE)
+        
+        writer = self._parquet_writer(parquet_path) if parquet_path else None
+        rows = []
+        try:
+            for text, doc_type, file_path, error in results:
+                if error:
+                    print(f"Error processing {file_path}: {error}")
+                elif text and len(text) > 50:  # Minimum text length
+                    rows.append((text, doc_type, file_path))
+                    if writer is not None and len(rows) >= PARQUET_BATCH_SIZE:
+                        self._write_parquet_batch(writer, rows)
+                        rows = []
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if writer is not None:
+                if rows:
+                    self._write_parquet_batch(writer, rows)
+                writer.close()
+        
+        if writer is not None:
+            df = pd.read_parquet(parquet_path)
+            df['document_type'] = df['document_type'].astype(str)
+            return df
+        return pd.DataFrame.from_records(rows, columns=['text', 'document_type', 'file_path'])
+    
+    @staticmethod
+    def _parquet_writer(parquet_path: str):
+        """ParquetWriter for labeled rows, or None when pyarrow is not installed"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("pyarrow is not installed; loading training data in memory")
+            return None
+        schema = pa.schema([
+            ('text', pa.large_string()),
+            ('document_type', pa.dictionary(pa.int32(), pa.string())),
+            ('file_path', pa.string()),
+        ])
+        os.makedirs(os.path.dirname(parquet_path) or '.', exist_ok=True)
+        return pq.ParquetWriter(parquet_path, schema)
+    
+    @staticmethod
+    def _write_parquet_batch(writer, rows):
+        """Flush buffered (text, document_type, file_path) rows as one record batch"""
+        import pyarrow as pa
+        texts, doc_types, file_paths = zip(*rows)
+        writer.write_batch(pa.RecordBatch.from_arrays([
+            pa.array(texts, type=pa.large_string()),
+            pa.array(doc_types, type=pa.string()).dictionary_encode().cast(
+                pa.dictionary(pa.int32(), pa.string())),
+            pa.array(file_paths, type=pa.string()),
+        ], schema=writer.schema))
     
-    def run_training(self, save_path: str = "models/document_classifier.joblib"):
+    def run_training(self, save_path: str = "models/document_classifier.joblib",
+                     parquet_path: str = None):
         """Run complete training pipeline"""
         # Load labeled data
         print("Loading training data...")
-        df = self.load_labeled_data()
+        df = self.load_labeled_data(parquet_path)
         
         if len(df) == 0:
             print("No labeled data found. Creating synthetic data...")
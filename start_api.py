@@ -18,24 +18,17 @@ def main():
         return
     
     # Create necessary directories
-    os.makedirs('logs', exist_ok=True)
-    os.makedirs('models', exist_ok=True)
-    os.makedirs('data/previews', exist_ok=True)
-    os.makedirs('data/exports', exist_ok=True)
+    from src.config import ensure_all_dirs
+    ensure_all_dirs()
     
     print("🚀 Starting Document Parser API Server...")
     print(f"📁 Project root: {current_dir}")
     
     try:
-        # Import and run the app
+        # Import the app
         from src.api_server import app
+        from src.config import get_config
         print("✅ API server imported successfully!")
-        print("🌐 Web Interface: http://localhost:5000")
-        print("🔧 API Health: http://localhost:5000/api/health")
-        print("\nPress Ctrl+C to stop the server")
-        
-        app.run(host='0.0.0.0', port=5000, debug=True)
-        
     except ImportError as e:
         print(f"❌ Import error: {e}")
         print("\n📋 Troubleshooting steps:")
@@ -43,6 +36,26 @@ def main():
         print("   pip install -r requirements.txt")
         print("2. Check that all files are in the correct locations")
         print("3. Ensure you're running from the project root directory")
+        return
+    
+    config = get_config()
+    print(f"🌐 Web Interface: http://localhost:{config.api_port}")
+    print(f"🔧 API Health: http://localhost:{config.api_port}/api/health")
+    print("\nPress Ctrl+C to stop the server")
+    
+    # FLASK_DEBUG=1 brings back the reloader and debugger for development
+    if os.environ.get('FLASK_DEBUG') == '1':
+        app.run(host=config.api_host, port=config.api_port, debug=True)
+        return
+    
+    try:
+        from waitress import serve
+    except ImportError:
+        print("⚠ waitress not installed; using Flask's threaded server (pip install waitress)")
+        app.run(host=config.api_host, port=config.api_port, debug=False, threaded=True)
+        return
+    serve(app, host=config.api_host, port=config.api_port,
+          threads=int(os.environ.get('API_THREADS', '16')), channel_timeout=120)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file